@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 from django.utils.translation import gettext_lazy as _
@@ -49,7 +50,17 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
 ]
 
+# Blacklist refresh tokens once rotated, so a stolen one can't be replayed.
+# Expired entries are pruned by running `python manage.py flushexpiredtokens`
+# periodically (e.g. from cron).
+JWT_BLACKLIST = os.environ.get("SOFTDESK_JWT_BLACKLIST") == "1"
+if JWT_BLACKLIST:
+    INSTALLED_APPS.append("rest_framework_simplejwt.token_blacklist")
+
 MIDDLEWARE = [
+    # First, so that the metrics cover the whole middleware stack
+    "crud.metrics.MetricsMiddleware",
+    "crud.routers.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -63,9 +74,18 @@ ROOT_URLCONF = "SoftDesk.urls"
 
 WSGI_APPLICATION = "SoftDesk.wsgi.application"
 
+# "production" drops the browsable API, which renders every response a second
+# time as HTML when a browser asks for it
+SOFTDESK_ENV = os.environ.get("SOFTDESK_ENV", "development")
+
+API_RENDERER_CLASSES = ["crud.renderers.FastJSONRenderer"]
+if SOFTDESK_ENV != "production":
+    API_RENDERER_CLASSES.append("rest_framework.renderers.BrowsableAPIRenderer")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Authenticates from the token claims without querying the User table
+        "rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication",
         # add any other authentication classes here, if needed
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -73,9 +93,12 @@ REST_FRAMEWORK = {
         # add any other permission classes here, if needed
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
-    "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
+    # JSON is encoded and decoded with orjson when it's installed
+    "DEFAULT_RENDERER_CLASSES": API_RENDERER_CLASSES,
+    "DEFAULT_PARSER_CLASSES": [
+        "crud.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -89,26 +112,15 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_RATES": {},
     "DEFAULT_METADATA_CLASS": "rest_framework.metadata.SimpleMetadata",
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.URLPathVersioning",
-    "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
-    ],
-    "DEFAULT_FILTER_BACKENDS": [
-        "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.SearchFilter",
-        "rest_framework.filters.OrderingFilter",
-    ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
-    "PAGE_SIZE": 10,
-    "TEST_REQUEST_DEFAULT_FORMAT": "json",
-    "DEFAULT_THROTTLE_CLASSES": [],
 }
 
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-    "ROTATE_REFRESH_TOKENS": False,
+    # Every refresh issues a new refresh token with a fresh lifetime, so active
+    # clients never have to log in again with their password
+    "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
@@ -119,18 +131,142 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "user_id",
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
+    "TOKEN_USER_CLASS": "crud.authentication.LazyTokenUser",
+}
+
+# Cache shared by the worker processes, set with SOFTDESK_REDIS_URL (needs
+# the redis package). The caches below that must see the writes of every
+# process are only enabled with it: the default in-process cache of each
+# worker would keep serving what another worker changed.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+SHARED_CACHE = None
+if os.environ.get("SOFTDESK_REDIS_URL"):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["SOFTDESK_REDIS_URL"],
+    }
+    SHARED_CACHE = "shared"
+
+MEMBERSHIP_CACHE = {
+    # Number of (user, project) permission entries kept in each process
+    "SIZE": 10000,
+    # Seconds before a cached permission is reloaded from the database. Without
+    # a shared cache, other processes apply a revoked permission until then.
+    "TTL": 300 if SHARED_CACHE else 5,
+    # Alias from CACHES to share entries between processes, whose lookups
+    # then see invalidations at once, None to disable
+    "BACKEND": SHARED_CACHE,
+}
+
+METRICS = {
+    # Bearer token Prometheus sends to read /metrics, None to leave it open
+    "TOKEN": os.environ.get("SOFTDESK_METRICS_TOKEN"),
+    # Dump the cProfile stats of sampled requests slower than this, in seconds
+    "PROFILE_SLOWER_THAN": None,
+    "PROFILE_SAMPLE_RATE": 0.01,
+    "PROFILE_DIR": BASE_DIR / "profiles",
+}
+
+RESPONSE_CACHE = {
+    # Alias from CACHES holding the rendered responses, None to disable. It
+    # must be shared by the worker processes, or a write seen by one worker
+    # won't invalidate the others.
+    "BACKEND": SHARED_CACHE,
+    # Seconds before a cached response is computed again
+    "TIMEOUT": 300,
 }
 
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# The database is chosen with SOFTDESK_DB_ENGINE: "sqlite" (the default) or
+# "postgresql", configured by the SOFTDESK_DB_* variables below. Connections
+# are kept open between requests for SOFTDESK_DB_CONN_MAX_AGE seconds and
+# checked before being reused.
+DB_ENGINE = os.environ.get("SOFTDESK_DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.environ.get("SOFTDESK_DB_CONN_MAX_AGE", 60))
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("SOFTDESK_DB_NAME", "softdesk"),
+            "USER": os.environ.get("SOFTDESK_DB_USER", "softdesk"),
+            "PASSWORD": os.environ.get("SOFTDESK_DB_PASSWORD", ""),
+            "HOST": os.environ.get("SOFTDESK_DB_HOST", "localhost"),
+            "PORT": os.environ.get("SOFTDESK_DB_PORT", "5432"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            # Behind PgBouncer in transaction mode, a server-side cursor
+            # can't outlive the transaction it was opened in
+            "DISABLE_SERVER_SIDE_CURSORS": (
+                os.environ.get("SOFTDESK_DB_POOLER") == "pgbouncer"
+            ),
+        }
     }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "crud.sqlite3",
+            "NAME": os.environ.get("SOFTDESK_DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    # Stock SQLite with SOFTDESK_SQLITE_TUNING=0. WAL lets readers run
+    # alongside the writer, and NORMAL synchronous only syncs the WAL at
+    # checkpoints, which can lose the last transactions on power loss but
+    # never corrupts the database. Transactions take the write lock when they
+    # begin, so concurrent writers queue on the busy timeout instead of
+    # failing.
+    if os.environ.get("SOFTDESK_SQLITE_TUNING", "1") == "1":
+        DATABASES["default"]["OPTIONS"].update(
+            {
+                # Seconds a connection waits for the write lock (the SQLite
+                # busy_timeout)
+                "timeout": 20,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode = WAL;"
+                    "PRAGMA synchronous = NORMAL;"
+                    "PRAGMA mmap_size = 268435456;"
+                    "PRAGMA cache_size = -64000;"
+                    "PRAGMA temp_store = MEMORY;"
+                ),
+            }
+        )
+
+# Read replicas, as a comma-separated list of SQLite files (copies refreshed
+# with `manage.py refresh_replicas`) or of PostgreSQL hosts. Requests with a
+# safe method read from them through crud.routers.
+DATABASE_REPLICAS = {
+    "ALIASES": [],
+    "PIN_SECONDS": int(os.environ.get("SOFTDESK_DB_REPLICA_PIN_SECONDS", 5)),
+    # Without a shared cache to remember who wrote, reads stay on the primary
+    "BACKEND": SHARED_CACHE,
 }
+for index, replica in enumerate(
+    name for name in os.environ.get("SOFTDESK_DB_REPLICAS", "").split(",") if name
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DB_ENGINE == "postgresql":
+        DATABASES[alias]["HOST"] = replica
+    else:
+        # Read-only: no write lock to take, and no journal mode to set
+        DATABASES[alias]["NAME"] = f"file:{replica}?mode=ro"
+        DATABASES[alias]["OPTIONS"] = {
+            key: value
+            for key, value in DATABASES["default"]["OPTIONS"].items()
+            if key not in ("transaction_mode", "init_command")
+        }
+    DATABASE_REPLICAS["ALIASES"].append(alias)
+
+DATABASE_ROUTERS = ["crud.routers.ReplicaRouter"]
 
 
 # Password validation
@@ -152,6 +288,45 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+
+PASSWORD_HASHING = {
+    # Preferred hasher: "scrypt", "argon2" (needs argon2-cffi) or "pbkdf2"
+    "ALGORITHM": os.environ.get("SOFTDESK_PASSWORD_HASHER", "scrypt"),
+    "PBKDF2_ITERATIONS": 600000,
+    "SCRYPT_WORK_FACTOR": 2**14,
+    "SCRYPT_BLOCK_SIZE": 8,
+    "SCRYPT_PARALLELISM": 1,
+    "ARGON2_TIME_COST": 2,
+    "ARGON2_MEMORY_COST": 102400,
+    "ARGON2_PARALLELISM": 8,
+    # Threads hashing passwords, and logins allowed to wait for one. Each of
+    # them holds a request thread, so their sum must stay well below the
+    # threads of the server.
+    "WORKERS": int(os.environ.get("SOFTDESK_PASSWORD_WORKERS", 4)),
+    "QUEUE_SIZE": int(os.environ.get("SOFTDESK_PASSWORD_QUEUE_SIZE", 4)),
+    # Seconds a login waits for a worker before giving up
+    "TIMEOUT": 10,
+}
+
+_PASSWORD_HASHERS = {
+    "scrypt": "crud.hashers.TunableScryptPasswordHasher",
+    "argon2": "crud.hashers.TunableArgon2PasswordHasher",
+    "pbkdf2": "crud.hashers.TunablePBKDF2PasswordHasher",
+}
+
+# The preferred hasher comes first, the others still verify existing hashes
+# and are upgraded on the next successful login.
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHING["ALGORITHM"]]] + [
+    hasher
+    for algorithm, hasher in _PASSWORD_HASHERS.items()
+    if algorithm != PASSWORD_HASHING["ALGORITHM"]
+]
+
+AUTHENTICATION_BACKENDS = ["crud.backends.PooledModelBackend"]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -1,4 +1,6 @@
 from django.urls import path
+import crud.async_views as async_views
+import crud.metrics as metrics
 import crud.views as views
 import django.contrib.auth.views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -7,6 +9,9 @@ urlpatterns = [
     # User registration and login
     path("auth/signup/", views.CustomSignupView.as_view(), name="signup"),
     path("auth/login/", views.CustomLoginView.as_view(), name="login"),
+    path("auth/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
+    # Prometheus metrics of the process
+    path("metrics", metrics.metrics_view, name="metrics"),
     # Project endpoints
     path(
         "projects/", views.ProjectListCreateView.as_view(), name="project-list-create"
@@ -22,6 +27,11 @@ urlpatterns = [
         views.ContributorListCreateView.as_view(),
         name="collaborator-list",
     ),
+    path(
+        "projects/<int:project_id>/users/bulk/",
+        views.ContributorBulkView.as_view(),
+        name="collaborator-bulk",
+    ),
     path(
         "projects/<int:project_id>/users/<int:user_id>",
         views.ContributorRetrieveUpdateDestroyView.as_view(),
@@ -33,12 +43,22 @@ urlpatterns = [
         views.IssueListCreateView.as_view(),
         name="issue-list-create",
     ),
+    path(
+        "projects/<int:project_id>/issues/bulk/",
+        views.IssueBulkView.as_view(),
+        name="issue-bulk",
+    ),
     path(
         "projects/<int:project_id>/issues/<int:issue_id>/",
         views.IssueRetrieveUpdateDestroyView.as_view(),
         name="issue-detail",
     ),
     # Comment endpoints
+    path(
+        "projects/<int:project_id>/comments/",
+        views.ProjectCommentListView.as_view(),
+        name="project-comment-list",
+    ),
     path(
         "projects/<int:project_id>/issues/<int:issue_id>/comments/",
         views.CommentListCreateView.as_view(),
@@ -49,4 +69,47 @@ urlpatterns = [
         views.CommentRetrieveUpdateDestroyView.as_view(),
         name="comment-detail",
     ),
+    # Search endpoint
+    path(
+        "projects/<int:project_id>/search/",
+        views.ProjectSearchView.as_view(),
+        name="project-search",
+    ),
+    # Export endpoint
+    path(
+        "projects/<int:project_id>/export/",
+        views.ProjectExportView.as_view(),
+        name="project-export",
+    ),
+    # Async read endpoints, for ASGI deployments
+    path(
+        "async/projects/",
+        async_views.AsyncProjectListView.as_view(),
+        name="async-project-list",
+    ),
+    path(
+        "async/projects/<int:project_id>/",
+        async_views.AsyncProjectDetailView.as_view(),
+        name="async-project-detail",
+    ),
+    path(
+        "async/projects/<int:project_id>/issues/",
+        async_views.AsyncIssueListView.as_view(),
+        name="async-issue-list",
+    ),
+    path(
+        "async/projects/<int:project_id>/issues/<int:issue_id>/",
+        async_views.AsyncIssueDetailView.as_view(),
+        name="async-issue-detail",
+    ),
+    path(
+        "async/projects/<int:project_id>/issues/<int:issue_id>/comments/",
+        async_views.AsyncCommentListView.as_view(),
+        name="async-comment-list",
+    ),
+    path(
+        "async/projects/<int:project_id>/issues/<int:issue_id>/comments/<int:comment_id>/",
+        async_views.AsyncCommentDetailView.as_view(),
+        name="async-comment-detail",
+    ),
 ]
@@ -0,0 +1,103 @@
+"""
+Compare the throughput and latency of the sync DRF read views with their async
+variants, both served by the ASGI application.
+
+    python -m benchmarks.async_views --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+
+from benchmarks.common import (
+    asgi_load,
+    benchmark_database,
+    report_load,
+    setup,
+)
+
+
+def populate(issues, comments_per_issue):
+    from crud.models import Comment, Contributor, Issue, Project, User
+
+    user = User.objects.create_user("benchmark")
+    project = Project.objects.create(
+        title="Benchmark", description="Benchmark", type="back-end", author_user=user
+    )
+    Contributor.objects.create(
+        user=user, project=project, permission="admin", role="owner"
+    )
+    Issue.objects.bulk_create(
+        Issue(
+            title=f"Issue {index}",
+            desc="Benchmark issue",
+            tag="bug",
+            priority="low",
+            status="open",
+            project=project,
+            author_user=user,
+            assignee_user=user,
+        )
+        for index in range(issues)
+    )
+    issue = Issue.objects.filter(project=project).first()
+    Comment.objects.bulk_create(
+        Comment(
+            project=project,
+            issue=issue,
+            description="Benchmark comment",
+            author_user=user,
+        )
+        for _ in range(comments_per_issue)
+    )
+    return user, project, issue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--issues", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from SoftDesk.asgi import application
+
+    with benchmark_database():
+        user, project, issue = populate(args.issues, args.comments)
+        headers = [(b"authorization", f"Bearer {AccessToken.for_user(user)}".encode())]
+        routes = {
+            "projects": ("/projects/", "/async/projects/"),
+            "project detail": (
+                f"/projects/{project.id}/",
+                f"/async/projects/{project.id}/",
+            ),
+            "issues": (
+                f"/projects/{project.id}/issues/",
+                f"/async/projects/{project.id}/issues/",
+            ),
+            "comments": (
+                f"/projects/{project.id}/issues/{issue.id}/comments/",
+                f"/async/projects/{project.id}/issues/{issue.id}/comments/",
+            ),
+        }
+
+        print(f"{args.requests} requests, {args.concurrency} concurrent clients")
+        for name, (sync_path, async_path) in routes.items():
+            for label, path in (("sync", sync_path), ("async", async_path)):
+                elapsed, latencies = asyncio.run(
+                    asgi_load(
+                        application,
+                        [path],
+                        headers,
+                        args.requests,
+                        args.concurrency,
+                    )
+                )
+                report_load(f"{name} ({label})", elapsed, latencies)
+
+
+if __name__ == "__main__":
+    main()
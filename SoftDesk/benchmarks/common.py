@@ -0,0 +1,175 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Each benchmark runs against a throwaway test database so the development
+database is never touched. Run them from the SoftDesk directory, e.g.
+``python -m benchmarks.project_visibility``.
+"""
+
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "SoftDesk.settings")
+    django.setup()
+
+
+@contextmanager
+def benchmark_database():
+    """Create and migrate a test database, and destroy it afterwards."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat):
+    """Call func repeat times and return the wall-clock timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(timings, percent):
+    ordered = sorted(timings)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def report(label, timings):
+    print(
+        f"{label:<40} "
+        f"median {statistics.median(timings) * 1000:9.3f} ms  "
+        f"p95 {percentile(timings, 95) * 1000:9.3f} ms  "
+        f"({len(timings)} runs)"
+    )
+
+
+async def asgi_get(application, path, headers=(), query_string=b""):
+    """
+    Send a GET request straight to an ASGI application and return the
+    response status code.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string,
+        "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await application(scope, receive, send)
+    return response["status"]
+
+
+async def asgi_load(application, paths, headers, requests, concurrency):
+    """
+    Issue requests GETs cycling over paths from concurrency concurrent
+    clients. Return the elapsed time and the latency of each request.
+    """
+    import asyncio
+
+    latencies = []
+    queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(paths[index % len(paths)])
+
+    async def client():
+        while not queue.empty():
+            path = queue.get_nowait()
+            path, _, query_string = path.partition("?")
+            start = time.perf_counter()
+            status = await asgi_get(application, path, headers, query_string.encode())
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def report_load(label, elapsed, latencies):
+    print(
+        f"{label:<40} "
+        f"{len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {percentile(latencies, 50) * 1000:8.2f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:8.2f} ms"
+    )
+
+
+def wsgi_load(application, paths, headers, requests, concurrency):
+    """
+    Issue requests GETs cycling over paths from concurrency threads calling a
+    WSGI application. Return the elapsed time and the latency of each request.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from io import BytesIO
+
+    def get(path):
+        path, _, query_string = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query_string,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": BytesIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            **{
+                "HTTP_" + name.decode().upper().replace("-", "_"): value.decode()
+                for name, value in headers
+            },
+        }
+        statuses = []
+        start = time.perf_counter()
+        body = application(environ, lambda status, _: statuses.append(status))
+        for _ in body:
+            pass
+        body.close()
+        latency = time.perf_counter() - start
+        if not statuses[0].startswith("200"):
+            raise RuntimeError(f"GET {path} returned {statuses[0]}")
+        return latency
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(
+            pool.map(get, (paths[index % len(paths)] for index in range(requests)))
+        )
+    return time.perf_counter() - start, latencies
@@ -0,0 +1,68 @@
+"""
+Measure logins per second for each password hasher, on one thread and through
+the bounded password worker pool.
+
+    python -m benchmarks.password_hashing --logins 200 --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import setup
+
+HASHERS = {
+    "pbkdf2": "pbkdf2_sha256",
+    "scrypt": "scrypt",
+    "argon2": "argon2",
+}
+
+
+def logins_per_second(logins, verify, callers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        results = list(executor.map(lambda _: verify(), range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.hashers import check_password, make_password
+
+    from crud.hashers import PasswordWorkerPool
+
+    pool = PasswordWorkerPool(args.workers, queue_size=args.logins, timeout=600)
+    print(f"{args.logins} logins, pool of {args.workers} workers")
+    for name, algorithm in HASHERS.items():
+        try:
+            encoded = make_password("correct horse battery staple", hasher=algorithm)
+        except ValueError as exc:
+            print(f"{name:<10} skipped: {exc}")
+            continue
+
+        single = logins_per_second(
+            args.logins,
+            lambda: check_password("correct horse battery staple", encoded),
+            callers=1,
+        )
+        pooled = logins_per_second(
+            args.logins,
+            lambda: pool.run(check_password, "correct horse battery staple", encoded),
+            callers=args.workers * 2,
+        )
+        print(
+            f"{name:<10} {single:9.1f} logins/s on one core  "
+            f"{pooled:9.1f} logins/s on the pool"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compare the former UNION and OR queries of ProjectListCreateView with the
+lookup of the ProjectAccess table by Project.objects.visible_to(), and the
+access check of a batch of projects against both tables and against
+ProjectAccess alone.
+
+    python -m benchmarks.project_visibility --projects 100000
+"""
+
+import argparse
+import random
+
+from benchmarks.common import benchmark_database, measure, report, setup
+
+
+def populate(projects, users, contributors_per_project):
+    from django.contrib.auth.hashers import make_password
+
+    from crud.access import rebuild
+    from crud.models import Contributor, Project, User
+
+    password = make_password("password")
+    User.objects.bulk_create(
+        User(username=f"user{i}", password=password) for i in range(users)
+    )
+    user_ids = list(User.objects.values_list("id", flat=True))
+
+    Project.objects.bulk_create(
+        (
+            Project(
+                title=f"Project {i}",
+                description="Benchmark project",
+                type="back-end",
+                author_user_id=random.choice(user_ids),
+            )
+            for i in range(projects)
+        ),
+        batch_size=5000,
+    )
+
+    contributors = []
+    for project_id in Project.objects.values_list("id", flat=True).iterator():
+        for user_id in random.sample(user_ids, contributors_per_project):
+            contributors.append(
+                Contributor(
+                    user_id=user_id,
+                    project_id=project_id,
+                    permission="user",
+                    role="dev",
+                )
+            )
+    Contributor.objects.bulk_create(contributors, batch_size=5000)
+    # Bulk inserts send no signal
+    rebuild()
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--projects", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--contributors", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Q
+
+    from crud.models import Contributor, Project, ProjectAccess
+
+    with benchmark_database():
+        random.seed(0)
+        user_ids = populate(args.projects, args.users, args.contributors)
+        users = random.sample(user_ids, min(args.repeat, len(user_ids)))
+        print(f"{args.projects} projects, {args.users} users")
+
+        def union_page():
+            user_id = random.choice(users)
+            queryset = Project.objects.filter(author_user=user_id).union(
+                Project.objects.filter(contributors=user_id)
+            )
+            queryset.count()
+            list(queryset.order_by("id")[: args.page_size])
+
+        def or_page():
+            user_id = random.choice(users)
+            contributions = Contributor.objects.filter(user=user_id).values(
+                "project_id"
+            )
+            queryset = Project.objects.filter(
+                Q(author_user=user_id) | Q(id__in=contributions)
+            ).order_by("id")
+            queryset.count()
+            list(queryset[: args.page_size])
+
+        def visible_page():
+            user_id = random.choice(users)
+            queryset = Project.objects.visible_to(user_id).order_by("id")
+            queryset.count()
+            list(queryset[: args.page_size])
+
+        project_ids = list(Project.objects.values_list("id", flat=True))
+
+        def check_batch_joined():
+            user_id = random.choice(users)
+            batch = random.sample(project_ids, min(args.batch, len(project_ids)))
+            permissions = dict(
+                Contributor.objects.filter(
+                    user=user_id, project_id__in=batch
+                ).values_list("project_id", "permission")
+            )
+            for project_id in Project.objects.filter(
+                author_user=user_id, id__in=batch
+            ).values_list("id", flat=True):
+                permissions[project_id] = "admin"
+
+        def check_batch_access():
+            user_id = random.choice(users)
+            batch = random.sample(project_ids, min(args.batch, len(project_ids)))
+            ProjectAccess.objects.permissions(user_id, batch)
+
+        report("UNION (count + first page)", measure(union_page, args.repeat))
+        report("OR/IN (count + first page)", measure(or_page, args.repeat))
+        report("ProjectAccess (count + first page)", measure(visible_page, args.repeat))
+        report(
+            f"Project + Contributor ({args.batch} checks)",
+            measure(check_batch_joined, args.repeat),
+        )
+        report(
+            f"ProjectAccess ({args.batch} checks)",
+            measure(check_batch_access, args.repeat),
+        )
+
+
+if __name__ == "__main__":
+    main()
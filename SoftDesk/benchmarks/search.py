@@ -0,0 +1,121 @@
+"""
+Compare the full-text search of ProjectSearchView with the LIKE '%term%'
+lookups a SearchFilter would run, over the comments of one project.
+
+    python -m benchmarks.search --comments 1000000
+"""
+
+import argparse
+import random
+
+from benchmarks.common import benchmark_database, measure, report, setup
+
+WORDS = (
+    "serveur client connexion erreur page base donnees requete lent crash "
+    "timeout cache jeton mot passe projet probleme commentaire utilisateur "
+    "export import fichier image affichage mobile navigateur version mise jour "
+    "test deploiement production configuration journal alerte memoire disque"
+).split()
+
+
+def sentence(words):
+    # A skewed vocabulary, as in real text: a few words are everywhere
+    return " ".join(random.choices(WORDS, weights=range(len(WORDS), 0, -1), k=words))
+
+
+def populate(projects, issues_per_project, comments):
+    from crud.models import Comment, Issue, Project, User
+
+    user = User.objects.create_user("benchmark")
+    Project.objects.bulk_create(
+        Project(
+            title=f"Project {i}",
+            description="Benchmark project",
+            type="back-end",
+            author_user=user,
+        )
+        for i in range(projects)
+    )
+    Issue.objects.bulk_create(
+        (
+            Issue(
+                title=sentence(4),
+                desc=sentence(20),
+                tag="bug",
+                priority="low",
+                project_id=project_id,
+                status="open",
+                author_user=user,
+                assignee_user=user,
+            )
+            for project_id in Project.objects.values_list("id", flat=True)
+            for _ in range(issues_per_project)
+        ),
+        batch_size=5000,
+    )
+    issues = list(Issue.objects.values_list("id", "project_id"))
+
+    def batch(size):
+        for _ in range(size):
+            issue_id, project_id = random.choice(issues)
+            yield Comment(
+                project_id=project_id,
+                issue_id=issue_id,
+                author_user=user,
+                description=sentence(12),
+            )
+
+    for start in range(0, comments, 50000):
+        Comment.objects.bulk_create(
+            batch(min(50000, comments - start)), batch_size=5000
+        )
+    return Project.objects.order_by("id").first().id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--issues", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Q
+
+    from crud.models import Comment
+    from crud.search import TARGETS, SearchResults
+
+    with benchmark_database():
+        random.seed(0)
+        project_id = populate(args.projects, args.issues, args.comments)
+        print(f"{args.comments} comments in {args.projects} projects")
+
+        for label, words in (("rare", ["alerte", "disque"]), ("common", ["serveur"])):
+
+            def like_page():
+                queryset = Comment.objects.filter(project_id=project_id)
+                for word in words:
+                    queryset = queryset.filter(Q(description__icontains=word))
+                queryset.count()
+                list(queryset.order_by("-id")[: args.page_size])
+
+            def search_page():
+                results = SearchResults(
+                    Comment.objects.all(), TARGETS["comments"], project_id, words
+                )
+                results.count()
+                results[: args.page_size]
+
+            report(
+                f"LIKE, {label} terms (count + page)", measure(like_page, args.repeat)
+            )
+            report(
+                f"Search, {label} terms (count + page)",
+                measure(search_page, args.repeat),
+            )
+
+
+if __name__ == "__main__":
+    main()
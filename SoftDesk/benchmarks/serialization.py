@@ -0,0 +1,125 @@
+"""
+Compare representing list pages with the model serializers and with their
+values representations, per row, for each serializer of the list endpoints.
+
+    python -m benchmarks.serialization --rows 1000
+"""
+
+import argparse
+import statistics
+
+from benchmarks.common import benchmark_database, measure, setup
+
+
+def populate(rows):
+    from crud.models import Comment, Contributor, Issue, Project, User
+
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(rows))
+    projects = Project.objects.bulk_create(
+        Project(
+            title=f"Project {i}",
+            description="Benchmark project",
+            type="back-end",
+            author_user=users[i],
+        )
+        for i in range(rows)
+    )
+    Contributor.objects.bulk_create(
+        Contributor(
+            user=users[(i + offset) % rows],
+            project=projects[i],
+            permission="user",
+            role="dev",
+        )
+        for i in range(rows)
+        for offset in range(3)
+    )
+    issues = Issue.objects.bulk_create(
+        Issue(
+            title=f"Issue {i}",
+            desc="Benchmark issue",
+            tag="bug",
+            priority="high",
+            project=projects[0],
+            status="open",
+            author_user=users[i],
+            assignee_user=users[-i],
+        )
+        for i in range(rows)
+    )
+    Comment.objects.bulk_create(
+        Comment(
+            project=projects[0],
+            description="Benchmark comment",
+            author_user=users[i],
+            issue=issues[i],
+        )
+        for i in range(rows)
+    )
+
+
+def per_row(timings, rows):
+    return statistics.median(timings) / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from crud.models import Comment, Contributor, Issue, Project
+    from crud.serializers import (
+        CommentSerializer,
+        ContributorSerializer,
+        IssueSerializer,
+        ProjectSerializer,
+    )
+
+    renderer = JSONRenderer()
+    cases = [
+        (ProjectSerializer, Project.objects.order_by("id")),
+        (IssueSerializer, Issue.objects.order_by("id")),
+        (CommentSerializer, Comment.objects.order_by("id")),
+        (ContributorSerializer, Contributor.objects.order_by("id")[: args.rows]),
+    ]
+
+    with benchmark_database():
+        populate(args.rows)
+        print(f"{args.rows} rows per page, median cost per row:")
+        print(f"{'':<40}{'serializer':>11}{'values':>12}")
+        for serializer_class, queryset in cases:
+            instances = list(serializer_class.shape_queryset(queryset))
+            rows = list(serializer_class.values_queryset(queryset))
+
+            def serialize_instances():
+                serializer_class(instances, many=True).data
+
+            def serialize_rows():
+                serializer_class(rows, many=True).data
+
+            def page_instances():
+                page = list(serializer_class.shape_queryset(queryset))
+                renderer.render(serializer_class(page, many=True).data)
+
+            def page_rows():
+                page = list(serializer_class.values_queryset(queryset))
+                renderer.render(serializer_class(page, many=True).data)
+
+            name = serializer_class.__name__
+            for label, before, after in (
+                ("representation", serialize_instances, serialize_rows),
+                ("query + render", page_instances, page_rows),
+            ):
+                print(
+                    f"{name + ' ' + label:<40}"
+                    f"{per_row(measure(before, args.repeat), args.rows):8.2f} us"
+                    f"{per_row(measure(after, args.repeat), args.rows):12.2f} us"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+"""
+Drive every route of SoftDesk/urls.py over a generated dataset, then load the
+read routes through the WSGI and ASGI applications, and compare the results
+with a stored baseline.
+
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --threshold 0.5
+
+Each route is requested through the test client with a JWT, with the caches
+cleared before every request so the view does its whole work, and reported
+with its throughput, p50/p95/p99 latency and queries per request. The run
+fails when a route runs more queries than in the baseline, or when its p50
+grows by more than the threshold. Latencies depend on the machine: save the
+baseline on the machine that runs the checks.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from itertools import count
+from pathlib import Path
+
+from benchmarks.common import (
+    asgi_load,
+    benchmark_database,
+    percentile,
+    report_load,
+    setup,
+    wsgi_load,
+)
+
+BASELINE = Path(__file__).with_name("baseline.json")
+PASSWORD = "Benchmark-pass-42"
+
+
+@dataclass
+class Case:
+    """
+    A request to a route. ``path`` and ``body`` are called with the state
+    returned by ``prepare``, which runs untimed before each request.
+    """
+
+    name: str
+    method: str
+    path: object
+    body: object = None
+    prepare: object = None
+    label: str = ""
+
+    @property
+    def key(self):
+        return f"{self.method} {self.label or self.name}"
+
+
+def subject():
+    """
+    Pick the busiest project, its author and its most commented issue, which
+    are the rows the requests are about.
+    """
+    from crud.models import Comment, Contributor, Issue, Project, User
+
+    project = Project.objects.order_by("-issue_count").first()
+    admin = project.author_user
+    issue = Issue.objects.filter(project=project).order_by("-comment_count").first()
+    # The author of an issue or comment is the one allowed to edit it
+    Issue.objects.filter(id=issue.id).update(author_user=admin)
+    comment = Comment.objects.create(
+        project=project, issue=issue, author_user=admin, description="Benchmark"
+    )
+    outsiders = list(
+        User.objects.exclude(contributor__project=project).values_list("id", flat=True)[
+            :1001
+        ]
+    )
+    member = Contributor.objects.create(
+        user_id=outsiders.pop(), project=project, permission="user", role="dev"
+    ).user_id
+    return project, admin, issue, comment, member, outsiders
+
+
+def cases(project, admin, issue, comment, member, outsiders):
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from crud.models import Comment, Contributor, Issue
+
+    project_path = f"/projects/{project.id}"
+    issue_path = f"{project_path}/issues/{issue.id}"
+    numbers = count()
+    issue_body = {
+        "title": "Benchmark issue",
+        "desc": "Created by the benchmark",
+        "tag": "bug",
+        "priority": "low",
+        "status": "open",
+        "assignee_user": admin.id,
+    }
+
+    def new_comment():
+        return Comment.objects.create(
+            project=project, issue=issue, author_user=admin, description="Deleted"
+        ).id
+
+    def new_issue():
+        return Issue.objects.create(
+            project=project,
+            author_user=admin,
+            assignee_user=admin,
+            **{
+                key: value
+                for key, value in issue_body.items()
+                if key != "assignee_user"
+            },
+        ).id
+
+    def new_contributor():
+        user_id = outsiders[next(numbers) % len(outsiders)]
+        Contributor.objects.get_or_create(
+            user_id=user_id, project=project, defaults={"permission": "user"}
+        )
+        return user_id
+
+    def next_outsider():
+        user_id = outsiders[next(numbers) % len(outsiders)]
+        Contributor.objects.filter(user_id=user_id, project=project).delete()
+        return user_id
+
+    return [
+        Case(
+            "signup",
+            "post",
+            "/auth/signup/",
+            lambda n: {
+                "username": f"signup{n}",
+                "email": f"signup{n}@example.com",
+                "password1": PASSWORD,
+                "password2": PASSWORD,
+            },
+            prepare=lambda: next(numbers),
+        ),
+        Case(
+            "login",
+            "post",
+            "/auth/login/",
+            lambda _: {"username": admin.username, "password": PASSWORD},
+        ),
+        Case(
+            "token-refresh",
+            "post",
+            "/auth/refresh/",
+            lambda token: {"refresh": token},
+            prepare=lambda: str(RefreshToken.for_user(admin)),
+        ),
+        Case("metrics", "get", "/metrics"),
+        Case("project-list-create", "get", "/projects/"),
+        Case(
+            "project-list-create",
+            "post",
+            "/projects/",
+            lambda _: {
+                "title": "Benchmark",
+                "description": "Created by the benchmark",
+                "type": "back-end",
+            },
+        ),
+        Case("project-detail", "get", f"{project_path}/"),
+        Case(
+            "project-detail",
+            "put",
+            f"{project_path}/",
+            lambda n: {
+                "title": f"Renamed {n}",
+                "description": project.description,
+                "type": project.type,
+                "author_user": admin.id,
+            },
+            prepare=lambda: next(numbers),
+        ),
+        Case(
+            "project-detail",
+            "delete",
+            lambda project_id: f"/projects/{project_id}/",
+            prepare=lambda: type(project)
+            .objects.create(
+                title="Deleted", description="Deleted", type="iOS", author_user=admin
+            )
+            .id,
+        ),
+        Case("collaborator-list", "get", f"{project_path}/users/"),
+        Case(
+            "collaborator-list",
+            "post",
+            f"{project_path}/users/",
+            lambda user_id: {"user": user_id, "permission": "user", "role": "dev"},
+            prepare=next_outsider,
+        ),
+        Case(
+            "collaborator-bulk",
+            "post",
+            f"{project_path}/users/bulk/",
+            lambda _: [
+                {"user": user_id, "permission": "user", "role": "qa"}
+                for user_id in outsiders[:50]
+            ],
+        ),
+        Case(
+            "collaborator-detail",
+            "put",
+            lambda user_id: f"{project_path}/users/{user_id}",
+            lambda _: {"permission": "user", "role": "ops"},
+            prepare=lambda: member,
+        ),
+        Case(
+            "collaborator-detail",
+            "delete",
+            lambda user_id: f"{project_path}/users/{user_id}",
+            prepare=new_contributor,
+        ),
+        Case("issue-list-create", "get", f"{project_path}/issues/"),
+        Case(
+            "issue-list-create",
+            "get",
+            f"{project_path}/issues/?status=open&priority=high",
+            label="issue-list-create?filtered",
+        ),
+        Case(
+            "issue-list-create",
+            "post",
+            f"{project_path}/issues/",
+            lambda _: issue_body,
+        ),
+        Case(
+            "issue-bulk",
+            "post",
+            f"{project_path}/issues/bulk/",
+            lambda _: [issue_body] * 50,
+        ),
+        Case(
+            "issue-bulk",
+            "patch",
+            f"{project_path}/issues/bulk/",
+            lambda ids: [{"id": pk, "status": "closed"} for pk in ids],
+            prepare=lambda: [new_issue() for _ in range(50)],
+        ),
+        Case(
+            "issue-bulk",
+            "delete",
+            f"{project_path}/issues/bulk/",
+            lambda ids: {"ids": ids},
+            prepare=lambda: [new_issue() for _ in range(50)],
+        ),
+        Case("issue-detail", "get", f"{issue_path}/"),
+        Case(
+            "issue-detail",
+            "put",
+            f"{issue_path}/",
+            lambda n: {"title": f"Renamed {n}"},
+            prepare=lambda: next(numbers),
+        ),
+        Case(
+            "issue-detail",
+            "delete",
+            lambda issue_id: f"{project_path}/issues/{issue_id}/",
+            prepare=new_issue,
+        ),
+        Case("project-comment-list", "get", f"{project_path}/comments/"),
+        Case("comment-list-create", "get", f"{issue_path}/comments/"),
+        Case(
+            "comment-list-create",
+            "post",
+            f"{issue_path}/comments/",
+            lambda _: {"description": "Benchmark comment"},
+        ),
+        Case("comment-detail", "get", f"{issue_path}/comments/{comment.id}/"),
+        Case(
+            "comment-detail",
+            "put",
+            f"{issue_path}/comments/{comment.id}/",
+            lambda n: {"description": f"Edited {n}"},
+            prepare=lambda: next(numbers),
+        ),
+        Case(
+            "comment-detail",
+            "delete",
+            lambda comment_id: f"{issue_path}/comments/{comment_id}/",
+            prepare=new_comment,
+        ),
+        Case("project-search", "get", f"{project_path}/search/?q=serveur+erreur"),
+        Case("project-export", "get", f"{project_path}/export/"),
+        Case("async-project-list", "get", "/async/projects/"),
+        Case("async-project-detail", "get", f"/async{project_path}/"),
+        Case("async-issue-list", "get", f"/async{project_path}/issues/"),
+        Case("async-issue-detail", "get", f"/async{issue_path}/"),
+        Case("async-comment-list", "get", f"/async{issue_path}/comments/"),
+        Case(
+            "async-comment-detail", "get", f"/async{issue_path}/comments/{comment.id}/"
+        ),
+    ]
+
+
+def check_coverage(cases):
+    from django.urls import get_resolver
+
+    routes = {name for name in get_resolver().reverse_dict if isinstance(name, str)}
+    missing = routes - {case.name for case in cases}
+    if missing:
+        sys.exit(f"No benchmark case for the routes: {', '.join(sorted(missing))}")
+
+
+def run_case(client, case, repeat):
+    """
+    Request the case repeat times, after a warm-up request, and return its
+    timings and the number of queries of each request.
+    """
+    from django.core.cache import caches
+    from django.db import connection
+
+    from crud.cache import membership_cache
+
+    timings, queries = [], []
+    executed = []
+
+    def count_query(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    for iteration in range(repeat + 1):
+        state = case.prepare() if case.prepare else None
+        path = case.path(state) if callable(case.path) else case.path
+        body = case.body(state) if case.body else None
+        caches["default"].clear()
+        membership_cache.clear()
+
+        executed.clear()
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            response = getattr(client, case.method)(path, body, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 300:
+            raise RuntimeError(
+                f"{case.key} returned {response.status_code}: {response.content[:200]}"
+            )
+        # The first request warms up imports and connection state
+        if iteration:
+            timings.append(elapsed)
+            queries.append(len(executed))
+    return timings, queries
+
+
+def summarize(timings, queries):
+    return {
+        "throughput": len(timings) / sum(timings),
+        "p50": percentile(timings, 50) * 1000,
+        "p95": percentile(timings, 95) * 1000,
+        "p99": percentile(timings, 99) * 1000,
+        "queries": statistics.median(queries),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the regressions of the results against the baseline."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result["queries"] > reference["queries"]:
+            regressions.append(
+                f"{key}: {result['queries']:g} queries per request, "
+                f"{reference['queries']:g} in the baseline"
+            )
+        if result["p50"] > reference["p50"] * (1 + threshold):
+            regressions.append(
+                f"{key}: p50 {result['p50']:.2f} ms, "
+                f"{reference['p50']:.2f} ms in the baseline"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--issues", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Tolerated growth of the p50 latencies over the baseline.",
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from SoftDesk.asgi import application as asgi_application
+
+    with benchmark_database():
+        call_command(
+            "generate_data",
+            users=args.users,
+            projects=args.projects,
+            issues=args.issues,
+            comments=args.comments,
+            password=PASSWORD,
+        )
+        project, admin, issue, comment, member, outsiders = subject()
+        token = str(AccessToken.for_user(admin))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        all_cases = cases(project, admin, issue, comment, member, outsiders)
+        check_coverage(all_cases)
+        print(
+            f"Project of {project.issue_count} issues, "
+            f"{args.repeat} requests per route"
+        )
+        print(f"{'':<44}{'req/s':>8}{'p50':>12}{'p95':>12}{'p99':>12}{'queries':>9}")
+        results = {}
+        for case in all_cases:
+            result = results[case.key] = summarize(*run_case(client, case, args.repeat))
+            print(
+                f"{case.key:<44}{result['throughput']:8.1f}"
+                f"{result['p50']:9.2f} ms{result['p95']:9.2f} ms"
+                f"{result['p99']:9.2f} ms{result['queries']:9g}"
+            )
+
+        headers = [(b"authorization", f"Bearer {token}".encode())]
+        paths = [
+            case.path
+            for case in all_cases
+            if case.method == "get" and case.name not in ("metrics", "project-export")
+        ]
+        print(
+            f"\n{args.requests} GETs over the read routes, {args.concurrency} clients"
+        )
+        elapsed, latencies = wsgi_load(
+            get_wsgi_application(), paths, headers, args.requests, args.concurrency
+        )
+        report_load("WSGI, threads", elapsed, latencies)
+        elapsed, latencies = asyncio.run(
+            asgi_load(asgi_application, paths, headers, args.requests, args.concurrency)
+        )
+        report_load("ASGI", elapsed, latencies)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.threshold
+        )
+        if regressions:
+            sys.exit("Regressions:\n" + "\n".join(regressions))
+        print("\nNo regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Measure the write throughput of several worker processes sharing a SQLite
+database file, with stock SQLite and with the tuned profile of the settings.
+
+    python -m benchmarks.write_concurrency --workers 8 --duration 10
+
+Each worker creates issues in a transaction, as the issue endpoints do, and
+runs reads of the issue list in between. Writes failing with "database is
+locked" are counted as errors.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import percentile, setup
+
+PROFILES = {"stock": "0", "tuned": "1"}
+
+
+def configure(database, tuning):
+    os.environ["SOFTDESK_DB_ENGINE"] = "sqlite"
+    os.environ["SOFTDESK_DB_NAME"] = str(database)
+    os.environ["SOFTDESK_SQLITE_TUNING"] = tuning
+    setup()
+
+
+def prepare(database, tuning):
+    configure(database, tuning)
+    from django.core.management import call_command
+
+    from crud.models import Contributor, Project, User
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create_user("benchmark")
+    project = Project.objects.create(
+        title="Benchmark", description="Benchmark", type="back-end", author_user=user
+    )
+    Contributor.objects.create(
+        user=user, project=project, permission="admin", role="owner"
+    )
+
+
+def work(database, tuning, duration, reads_per_write, barrier, results):
+    configure(database, tuning)
+    from django.db import OperationalError, transaction
+
+    from crud.models import Issue, Project
+
+    project = Project.objects.get()
+    latencies, errors, reads = [], 0, 0
+    barrier.wait()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                Issue.objects.create(
+                    title="Benchmark issue",
+                    desc="Written concurrently",
+                    tag="bug",
+                    priority="low",
+                    status="open",
+                    project=project,
+                    author_user_id=project.author_user_id,
+                    assignee_user_id=project.author_user_id,
+                )
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+        for _ in range(reads_per_write):
+            list(Issue.objects.filter(project=project).order_by("-id")[:20])
+            reads += 1
+    results.put((latencies, errors, reads))
+
+
+def run(profile, tuning, args, directory):
+    context = multiprocessing.get_context("spawn")
+    database = Path(directory) / f"{profile}.sqlite3"
+    process = context.Process(target=prepare, args=(database, tuning))
+    process.start()
+    process.join()
+
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=work,
+            args=(
+                database,
+                tuning,
+                args.duration,
+                args.reads_per_write,
+                barrier,
+                results,
+            ),
+        )
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    latencies, errors, reads = [], 0, 0
+    for _ in workers:
+        worker_latencies, worker_errors, worker_reads = results.get()
+        latencies += worker_latencies
+        errors += worker_errors
+        reads += worker_reads
+    for worker in workers:
+        worker.join()
+
+    print(
+        f"{profile:<8}"
+        f"{len(latencies) / args.duration:9.1f} writes/s"
+        f"{reads / args.duration:10.1f} reads/s  "
+        f"p50 {percentile(latencies, 50) * 1000:8.2f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:8.2f} ms  "
+        f"{errors} locked"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--reads-per-write", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.workers} worker processes, {args.duration:g}s")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile, tuning in PROFILES.items():
+            run(profile, tuning, args, directory)
+
+
+if __name__ == "__main__":
+    main()
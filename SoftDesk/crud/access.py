@@ -0,0 +1,152 @@
+"""
+Effective permissions of users on projects, materialized in ProjectAccess.
+
+The author of a project is its admin, whatever its Contributor row says, and
+the other contributors have the permission of their row. Single saves and
+deletes of projects and contributors go through the signals of crud.signals,
+which ``grant`` the single row they change; bulk writes, which send no signal,
+call ``sync`` themselves. ``rebuild`` recomputes the whole table to repair a
+drift.
+"""
+from django.db import transaction
+
+from .cache import membership_cache
+from .models import Contributor, Project, ProjectAccess
+
+
+def effective_permissions(project_id, user_ids=None, author_id=None):
+    """
+    Map the users of a project, or the given ones only, to their effective
+    permission on it. ``author_id`` spares the lookup of the author when the
+    caller has the project at hand.
+    """
+    if author_id is None:
+        author_id = (
+            Project.objects.filter(id=project_id)
+            .values_list("author_user_id", flat=True)
+            .first()
+        )
+    if author_id is None:
+        return {}
+    contributors = Contributor.objects.filter(project_id=project_id)
+    if user_ids is not None:
+        contributors = contributors.filter(user_id__in=user_ids)
+    permissions = dict(contributors.values_list("user_id", "permission"))
+    if user_ids is None or author_id in user_ids:
+        permissions[author_id] = "admin"
+    return permissions
+
+
+def _write(stored, wanted):
+    """
+    Turn the stored access rows, mapping (user_id, project_id) to a
+    permission, into the wanted ones, and return the keys that changed.
+    """
+    revoked = stored.keys() - wanted.keys()
+    granted = {key: perm for key, perm in wanted.items() if stored.get(key) != perm}
+    for user_id, project_id in revoked:
+        ProjectAccess.objects.filter(user_id=user_id, project_id=project_id).delete()
+    if granted:
+        ProjectAccess.objects.bulk_create(
+            [
+                ProjectAccess(user_id=user_id, project_id=project_id, permission=perm)
+                for (user_id, project_id), perm in granted.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "project"],
+            update_fields=["permission"],
+        )
+    return revoked | granted.keys()
+
+
+def sync(project_id, user_ids=None, author_id=None):
+    """
+    Bring the access rows of a project, or of the given users only, in line
+    with its author and contributors. Returns the ids of the users whose
+    access changed.
+    """
+    # Part of the transaction of the write that changed the access, if any
+    with transaction.atomic(savepoint=False):
+        rows = ProjectAccess.objects.filter(project_id=project_id)
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        stored = {
+            (user_id, project_id): perm
+            for user_id, perm in rows.values_list("user_id", "permission")
+        }
+        wanted = {
+            (user_id, project_id): perm
+            for user_id, perm in effective_permissions(
+                project_id, user_ids, author_id
+            ).items()
+        }
+        return {user_id for user_id, _ in _write(stored, wanted)}
+
+
+def grant_author(project):
+    """Make the author of a new project its admin."""
+    ProjectAccess.objects.create(
+        user_id=project.author_user_id, project_id=project.id, permission="admin"
+    )
+
+
+def grant(project_id, user_id, permission, created=False):
+    """
+    Store the effective permission of a user on a project given the
+    permission of their Contributor row, None once it is deleted. ``created``
+    tells that the row was just created.
+    """
+    is_author = None
+    if permission != "admin" or created:
+        # Only the author of the project gets more than their row, and has an
+        # access row without one
+        is_author = Project.objects.filter(id=project_id, author_user=user_id).exists()
+        if is_author:
+            permission = "admin"
+    rows = ProjectAccess.objects.filter(user_id=user_id, project_id=project_id)
+    if permission is None:
+        rows.delete()
+    elif created and not is_author:
+        # Upserted all the same, over a row left by a drift
+        ProjectAccess.objects.bulk_create(
+            [
+                ProjectAccess(
+                    user_id=user_id, project_id=project_id, permission=permission
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "project"],
+            update_fields=["permission"],
+        )
+    elif not rows.update(permission=permission):
+        ProjectAccess.objects.create(
+            user_id=user_id, project_id=project_id, permission=permission
+        )
+
+
+def rebuild():
+    """
+    Recompute the access rows that drifted from the projects and contributors,
+    and return the number of (user, project) pairs that were repaired.
+    """
+    stored = {
+        (user_id, project_id): perm
+        for user_id, project_id, perm in ProjectAccess.objects.values_list(
+            "user_id", "project_id", "permission"
+        ).iterator()
+    }
+    wanted = {
+        (user_id, project_id): perm
+        for user_id, project_id, perm in Contributor.objects.values_list(
+            "user_id", "project_id", "permission"
+        ).iterator()
+    }
+    for project_id, author_id in Project.objects.values_list(
+        "id", "author_user_id"
+    ).iterator():
+        wanted[author_id, project_id] = "admin"
+    repaired = _write(stored, wanted)
+    # Cached permissions of the repaired pairs are stale
+    for user_id, project_id in repaired:
+        membership_cache.invalidate(project_id, user_id)
+    return len(repaired)
@@ -0,0 +1,165 @@
+"""
+ASGI-native variants of the read endpoints.
+
+These views answer GET without the thread hop that sync DRF views need under an
+ASGI server: JWT validation and serialization happen on the event loop and the
+database is reached through Django's async ORM. They return the same
+representations as their sync counterparts in ``crud.views``.
+"""
+
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .filters import IssueFilter
+from .models import Comment, Issue, Project
+from .pagination import AsyncLimitOffsetPagination, KeysetPagination
+from .permissions import aget_project_permission, is_allowed
+from .renderers import FastJSONRenderer
+from .serializers import CommentSerializer, IssueSerializer, ProjectSerializer
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async read views: authenticates the JWT bearer, runs the
+    async handler and renders its data as JSON.
+    """
+
+    http_method_names = ["get", "head"]
+    authentication = JWTStatelessUserAuthentication()
+    renderer = FastJSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        try:
+            request.user = self.authenticate(request)
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            data, status_code = await handler(request, *args, **kwargs)
+        except Http404:
+            data, status_code = {"detail": "Not found."}, status.HTTP_404_NOT_FOUND
+        except exceptions.APIException as exc:
+            data, status_code = {"detail": exc.detail}, exc.status_code
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type=self.renderer.media_type,
+        )
+
+    async def head(self, request, *args, **kwargs):
+        return await self.get(request, *args, **kwargs)
+
+    def authenticate(self, request):
+        # Token users are built from the claims, so no query is needed here
+        authenticated = self.authentication.authenticate(request)
+        if authenticated is None:
+            raise exceptions.NotAuthenticated()
+        return authenticated[0]
+
+    async def check_object_permissions(self, request, obj, project_id):
+        permission = await aget_project_permission(request, project_id)
+        is_author = getattr(obj, "author_user_id", None) == request.user.id
+        if not is_allowed(permission, is_author, request.method):
+            raise exceptions.PermissionDenied()
+
+    async def get_project(self, request, project_id):
+        try:
+            project = await Project.objects.aget(id=project_id)
+        except Project.DoesNotExist:
+            raise Http404
+        await self.check_object_permissions(request, project, project.id)
+        return project
+
+    async def paginate(self, request, queryset, serializer_class, pagination_class):
+        paginator = pagination_class()
+        representation = serializer_class.values_representation()
+        if representation is None:
+            page = await paginator.apaginate_queryset(queryset, request)
+            data = serializer_class(page, many=True, context={"request": request}).data
+        else:
+            page = await paginator.apaginate_queryset(
+                representation.values(queryset), request
+            )
+            data = await representation.arepresent(page)
+        return paginator.get_paginated_response(data).data, status.HTTP_200_OK
+
+
+"""PROJECTS"""
+
+
+class AsyncProjectListView(AsyncAPIView):
+    async def get(self, request):
+        queryset = ProjectSerializer.shape_queryset(
+            Project.objects.visible_to(request.user.id).order_by("id")
+        )
+        return await self.paginate(
+            request, queryset, ProjectSerializer, AsyncLimitOffsetPagination
+        )
+
+
+class AsyncProjectDetailView(AsyncAPIView):
+    async def get(self, request, project_id):
+        project = await self.get_project(request, project_id)
+        contributors = [user async for user in project.contributors.only("id")]
+        project._prefetched_objects_cache = {"contributors": contributors}
+        return ProjectSerializer(project).data, status.HTTP_200_OK
+
+
+"""ISSUES"""
+
+
+class AsyncIssueListView(AsyncAPIView):
+    async def get(self, request, project_id):
+        project = await self.get_project(request, project_id)
+        filterset = IssueFilter(
+            request.query_params, queryset=Issue.objects.filter(project_id=project.id)
+        )
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+        queryset = IssueSerializer.shape_queryset(filterset.qs)
+        return await self.paginate(request, queryset, IssueSerializer, KeysetPagination)
+
+
+class AsyncIssueDetailView(AsyncAPIView):
+    async def get(self, request, project_id, issue_id):
+        project = await self.get_project(request, project_id)
+        try:
+            issue = await Issue.objects.select_related(
+                "author_user", "assignee_user"
+            ).aget(project_id=project.id, id=issue_id)
+        except Issue.DoesNotExist:
+            raise Http404
+        return IssueSerializer(issue).data, status.HTTP_200_OK
+
+
+"""COMMENTS"""
+
+
+class AsyncCommentListView(AsyncAPIView):
+    async def get(self, request, project_id, issue_id):
+        project = await self.get_project(request, project_id)
+        queryset = Comment.objects.filter(
+            issue_id=issue_id, issue__project_id=project.id
+        )
+        return await self.paginate(
+            request,
+            CommentSerializer.shape_queryset(queryset),
+            CommentSerializer,
+            KeysetPagination,
+        )
+
+
+class AsyncCommentDetailView(AsyncAPIView):
+    async def get(self, request, project_id, issue_id, comment_id):
+        project = await self.get_project(request, project_id)
+        try:
+            comment = await Comment.objects.select_related("author_user").aget(
+                issue_id=issue_id, issue__project_id=project.id, id=comment_id
+            )
+        except Comment.DoesNotExist:
+            raise Http404
+        await self.check_object_permissions(request, comment, project.id)
+        return CommentSerializer(comment).data, status.HTTP_200_OK
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+
+
+def _from_user(name):
+    return property(lambda self: getattr(self._user, name))
+
+
+class LazyTokenUser(TokenUser):
+    """
+    User backed by the claims of a validated access token.
+
+    Authenticating with it costs no query: the views and permissions only need
+    the user id, which the token carries. Every other attribute (username,
+    is_staff, has_perm(), email, ...) loads the full User row on first access.
+
+    A token stays usable until it expires even if its user is deactivated or
+    deleted in the meantime, which ACCESS_TOKEN_LIFETIME keeps short.
+    """
+
+    # TokenUser answers these from claims our tokens don't carry, which would
+    # read as empty names and missing rights
+    username = _from_user("username")
+    get_username = _from_user("get_username")
+    is_staff = _from_user("is_staff")
+    is_superuser = _from_user("is_superuser")
+    groups = _from_user("groups")
+    user_permissions = _from_user("user_permissions")
+    get_group_permissions = _from_user("get_group_permissions")
+    get_all_permissions = _from_user("get_all_permissions")
+    has_perm = _from_user("has_perm")
+    has_perms = _from_user("has_perms")
+    has_module_perms = _from_user("has_module_perms")
+
+    @cached_property
+    def _user(self):
+        return get_user_model().objects.get(pk=self.id)
+
+    def __getattr__(self, name):
+        # Only reached for attributes TokenUser doesn't define
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._user, name)
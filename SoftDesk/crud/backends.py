@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import password_pool
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend hashing passwords on the bounded password worker pool.
+
+    Hashes made with a hasher that is no longer preferred, or with outdated
+    cost parameters, are transparently upgraded on a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            password_pool.make_password(password)
+            return
+
+        is_correct, rehashed = password_pool.verify_password(password, user.password)
+        if rehashed is not None:
+            user.password = rehashed
+            user.save(update_fields=["password"])
+        if is_correct and self.user_can_authenticate(user):
+            return user
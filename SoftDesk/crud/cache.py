@@ -0,0 +1,291 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import ProjectAccess
+
+# Stored in place of a permission level for users without access to the
+# project, so that negative lookups are cached as well.
+NOT_CONTRIBUTOR = ""
+
+_MISSING = object()
+
+DEFAULTS = {
+    # Maximum number of (user, project) entries kept in the process
+    "SIZE": 10000,
+    # Seconds before an entry is reloaded from the database. Without a backend,
+    # this is how long other processes may apply a revoked permission.
+    "TTL": 5,
+    # Optional alias from settings.CACHES shared between processes
+    "BACKEND": None,
+}
+
+
+class MembershipCache:
+    """
+    Process-wide cache mapping (user_id, project_id) to the effective
+    permission level stored in ProjectAccess.
+
+    Entries live in an in-process LRU and, when a backend alias is configured,
+    in the matching Django cache so that other workers can share them. Writes
+    to Contributor and Project invalidate the affected entries through signals
+    by bumping the generation of the project in the backend, against which
+    every lookup checks its in-process entry, so other workers see the change
+    at once. Without a backend they only see it when their entry expires.
+    """
+
+    def __init__(self, size, ttl, backend=None):
+        self.size = size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backend_hits = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, "MEMBERSHIP_CACHE", {})}
+        backend = caches[options["BACKEND"]] if options["BACKEND"] else None
+        return cls(options["SIZE"], options["TTL"], backend)
+
+    def _entry_key(self, user_id, project_id):
+        return f"crud:membership:{project_id}:{user_id}"
+
+    def _generation_key(self, project_id):
+        return f"crud:membership:generation:{project_id}"
+
+    def get_permission(self, user_id, project_id):
+        """
+        Return the permission level of a user on a project, or None when the
+        user has no access to it.
+        """
+        generation = None
+        if self.backend is not None:
+            # Read before the database, so that an entry loaded from rows an
+            # invalidation has since changed is stored as stale
+            generation = self.backend.get(self._generation_key(project_id), 0)
+
+        permission = self._get_local(user_id, project_id, generation)
+        if permission is _MISSING and self.backend is not None:
+            permission = self._get_shared(user_id, project_id, generation)
+            if permission is not _MISSING:
+                self.backend_hits += 1
+                self._set_local(user_id, project_id, permission, generation)
+
+        if permission is _MISSING:
+            self.misses += 1
+            # From the primary: a replica lagging behind a new contribution
+            # would have its stale answer cached for the whole TTL
+            permission = (
+                ProjectAccess.objects.using(DEFAULT_DB_ALIAS)
+                .filter(user_id=user_id, project_id=project_id)
+                .values_list("permission", flat=True)
+                .first()
+            ) or NOT_CONTRIBUTOR
+            self._set_local(user_id, project_id, permission, generation)
+            if self.backend is not None:
+                self._set_shared(user_id, project_id, permission, generation)
+        else:
+            self.hits += 1
+
+        return permission or None
+
+    async def aget_permission(self, user_id, project_id):
+        """
+        Async variant of get_permission. In-process hits are answered without
+        leaving the event loop when there is no backend to check them against.
+        """
+        if self.backend is not None:
+            return await sync_to_async(self.get_permission)(user_id, project_id)
+        permission = self._get_local(user_id, project_id)
+        if permission is _MISSING:
+            return await sync_to_async(self.get_permission)(user_id, project_id)
+        self.hits += 1
+        return permission or None
+
+    def _get_local(self, user_id, project_id, generation=None):
+        key = (user_id, project_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            permission, expires_at, entry_generation = entry
+            # Entries of an older generation were invalidated by another worker
+            if expires_at < time.monotonic() or entry_generation != generation:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return permission
+
+    def _set_local(self, user_id, project_id, permission, generation=None):
+        with self._lock:
+            self._entries[(user_id, project_id)] = (
+                permission,
+                time.monotonic() + self.ttl,
+                generation,
+            )
+            self._entries.move_to_end((user_id, project_id))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_shared(self, user_id, project_id, generation):
+        entry = self.backend.get(self._entry_key(user_id, project_id))
+        # Entries written before the project was invalidated are stale
+        if entry is None or entry[1] != generation:
+            return _MISSING
+        return entry[0]
+
+    def _set_shared(self, user_id, project_id, permission, generation):
+        self.backend.set(
+            self._entry_key(user_id, project_id), (permission, generation), self.ttl
+        )
+
+    def invalidate(self, project_id, user_id=None):
+        """
+        Drop the cached entry of a user on a project, or every entry of the
+        project when no user is given, now and once the current transaction
+        commits, so that an entry loaded from the rows before the commit isn't
+        served afterwards.
+        """
+        self._drop(project_id, user_id)
+        transaction.on_commit(lambda: self._drop(project_id, user_id))
+
+    def _drop(self, project_id, user_id):
+        with self._lock:
+            if user_id is not None:
+                self._entries.pop((user_id, project_id), None)
+            else:
+                for key in [key for key in self._entries if key[1] == project_id]:
+                    del self._entries[key]
+
+        if self.backend is not None:
+            # Other workers only learn of it through the generation, even for a
+            # single user
+            generation_key = self._generation_key(project_id)
+            if not self.backend.add(generation_key, 1, None):
+                self.backend.incr(generation_key)
+
+    def clear(self):
+        """Drop every in-process entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.backend_hits = 0
+
+    def stats(self):
+        """Return the hit/miss/eviction counters and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "backend_hits": self.backend_hits,
+            "size": len(self._entries),
+            "max_size": self.size,
+            "ttl": self.ttl,
+        }
+
+
+membership_cache = MembershipCache.from_settings()
+
+
+RESPONSE_DEFAULTS = {
+    # Alias from settings.CACHES holding the responses, shared by the worker
+    # processes, None to disable
+    "BACKEND": None,
+    # Seconds before a cached response is computed again
+    "TIMEOUT": 300,
+}
+
+
+class ResponseCache:
+    """
+    Rendered GET responses of a project, shared by its contributors.
+
+    Entries are keyed on the project, the endpoint, the full path with its
+    query parameters, the negotiated media type and the permission level of
+    the user, and tagged with the generation of the project. Any write to the
+    project, its contributors, issues or comments bumps the generation, which
+    turns every entry of the project stale at once.
+    """
+
+    def __init__(self, backend, timeout):
+        self.backend = backend
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**RESPONSE_DEFAULTS, **getattr(settings, "RESPONSE_CACHE", {})}
+        backend = caches[options["BACKEND"]] if options["BACKEND"] else None
+        return cls(backend, options["TIMEOUT"])
+
+    def _generation_key(self, project_id):
+        return f"crud:response:generation:{project_id}"
+
+    def entry_key(self, project_id, endpoint, request, permission):
+        variant = hashlib.md5(
+            f"{request.get_full_path()}:{request.accepted_media_type}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f"crud:response:{project_id}:{endpoint}:{permission}:{variant}"
+
+    def lookup(self, project_id, entry_key):
+        """
+        Return the cached response data of an entry, or None, and the current
+        generation of the project, under which a response computed now can be
+        stored.
+        """
+        if self.backend is None:
+            return None, None
+        generation_key = self._generation_key(project_id)
+        values = self.backend.get_many([entry_key, generation_key])
+        generation = values.get(generation_key, 0)
+        entry = values.get(entry_key)
+        if entry is None or entry[0] != generation:
+            self.misses += 1
+            return None, generation
+        self.hits += 1
+        return entry[1], generation
+
+    def store(self, entry_key, generation, data):
+        # The generation read before the response was computed: if the project
+        # was written since, the entry is stale as soon as it's stored
+        if self.backend is not None:
+            self.backend.set(entry_key, (generation, data), self.timeout)
+
+    def invalidate(self, project_id):
+        """
+        Turn every cached response of the project stale, now and once the
+        current transaction commits, so that a response computed from the rows
+        before the commit isn't served afterwards.
+        """
+        if self.backend is None:
+            return
+        self._bump(project_id)
+        transaction.on_commit(lambda: self._bump(project_id))
+
+    def _bump(self, project_id):
+        generation_key = self._generation_key(project_id)
+        if not self.backend.add(generation_key, 1, None):
+            try:
+                self.backend.incr(generation_key)
+            except ValueError:
+                # Evicted in between
+                self.backend.add(generation_key, 1, None)
+
+    def stats(self):
+        """Return the hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "timeout": self.timeout}
+
+
+response_cache = ResponseCache.from_settings()
@@ -0,0 +1,164 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+from .cache import response_cache
+from .permissions import get_project_permission, is_allowed
+from .routers import use_primary
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag of a representation built from the given version parts.
+
+    The negotiated media type is part of the tag because each renderer
+    produces a different body for the same rows.
+    """
+    media_type = getattr(request, "accepted_media_type", "")
+    digest = hashlib.md5(
+        ":".join(str(part) for part in (*parts, media_type)).encode(),
+        usedforsecurity=False,
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Return a 304 response when the client's validators still match, else None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answer GET on a single object with ETag and Last-Modified derived from its
+    updated_time column, and return 304 before serializing when they match.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(
+            request, instance._meta.label, instance.pk, instance.updated_time
+        )
+        response = not_modified_response(request, etag, instance.updated_time)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, instance.updated_time)
+
+
+class ConditionalListMixin:
+    """
+    Answer GET on a collection with an ETag computed from the latest
+    updated_time and the row count of the filtered queryset, so an unchanged
+    list is revalidated with a single aggregate query.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        summary = queryset.aggregate(
+            last_modified=Max("updated_time"), count=Count("id")
+        )
+        etag = make_etag(
+            request,
+            queryset.model._meta.label,
+            request.get_full_path(),
+            summary["count"],
+            summary["last_modified"],
+        )
+        response = not_modified_response(request, etag, summary["last_modified"])
+        if response is not None:
+            return response
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            response = Response(serializer.data)
+        return set_validators(response, etag, summary["last_modified"])
+
+
+class CachedResponseMixin:
+    """
+    Serve GET from the response cache of the project when the requesting user
+    is a contributor allowed to read it.
+
+    The permission is still resolved on every request, from the membership
+    cache, so a hit costs no query beyond it. Misses are computed by the view
+    and stored once rendered, with their validators, so a cached response
+    answers conditional requests as well. Users that aren't contributors, and
+    other formats than JSON, always go through the view.
+    """
+
+    cache_endpoint = None
+
+    def get(self, request, *args, **kwargs):
+        project_id = self.kwargs["project_id"]
+        permission = get_project_permission(request, project_id)
+        if (
+            not is_allowed(permission, False, request.method)
+            or request.accepted_renderer.format != "json"
+        ):
+            return super().get(request, *args, **kwargs)
+
+        entry_key = response_cache.entry_key(
+            project_id, self.cache_endpoint, request, permission
+        )
+        data, generation = response_cache.lookup(project_id, entry_key)
+        if data is not None:
+            return cached_response(request, data)
+
+        # Entries are computed from the primary, as a replica lagging behind
+        # the write that bumped the generation would store stale rows under it
+        with use_primary():
+            response = super().get(request, *args, **kwargs)
+        if response.status_code == 200 and generation is not None:
+
+            def store(response):
+                response_cache.store(
+                    entry_key,
+                    generation,
+                    {
+                        "content": response.content,
+                        "content_type": response["Content-Type"],
+                        "etag": response.get("ETag"),
+                        "last_modified": response.get("Last-Modified"),
+                    },
+                )
+
+            response.add_post_render_callback(store)
+        return response
+
+
+def cached_response(request, data):
+    last_modified = data["last_modified"]
+    response = get_conditional_response(
+        request,
+        etag=data["etag"],
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+    )
+    if response is None:
+        response = HttpResponse(data["content"], content_type=data["content_type"])
+    if data["etag"]:
+        response["ETag"] = data["etag"]
+    if last_modified:
+        response["Last-Modified"] = last_modified
+    return response
@@ -0,0 +1,178 @@
+"""
+Denormalized counters of projects and issues.
+
+``Project.issue_count``, ``Project.open_issue_count`` and
+``Issue.comment_count`` are adjusted with ``F()`` expressions whenever an issue
+or a comment is created, deleted, moved or changes status, so listing them
+never aggregates. Single saves and deletes go through the signals of
+crud.signals; bulk writes, which send no signal, call these helpers themselves.
+``recount`` recomputes every counter to repair a drift.
+"""
+from collections import Counter
+import contextvars
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import response_cache
+from .models import Comment, Issue, Project
+
+
+# Set while delete_issues accounts for the issues it deletes by project
+batch_deleting = contextvars.ContextVar("batch_deleting", default=False)
+
+
+def adjust_project(project_id, issues=0, open_issues=0):
+    if not issues and not open_issues:
+        return
+    # The counters are part of the representation, so the validators change too
+    Project.objects.filter(id=project_id).update(
+        issue_count=F("issue_count") + issues,
+        open_issue_count=F("open_issue_count") + open_issues,
+        updated_time=timezone.now(),
+    )
+
+
+def adjust_issue(issue_id, comments):
+    if not comments:
+        return
+    Issue.objects.filter(id=issue_id).update(
+        comment_count=F("comment_count") + comments,
+        updated_time=timezone.now(),
+    )
+
+
+_counted_fields = {Issue: ("project", "status"), Comment: ("issue",)}
+
+
+def load_counted_state(instance):
+    """
+    Load the state the counters account for when the instance wasn't loaded
+    with it, before a save overwrites it.
+    """
+    if instance._state.adding or hasattr(instance, "_counted_state"):
+        return
+    model = type(instance)
+    stored = (
+        model._base_manager.filter(id=instance.id).only(*_counted_fields[model]).first()
+    )
+    if stored is not None:
+        instance._counted_state = stored._counted_state
+
+
+def count_issues(issues):
+    """
+    Account for issues that were created, moved to another project or changed
+    status since they were loaded, grouping the updates by project.
+    """
+    issue_counts = Counter()
+    open_counts = Counter()
+    for issue in issues:
+        previous = getattr(issue, "_counted_state", None)
+        current = issue.counted_state
+        if previous == current:
+            continue
+        if previous is not None:
+            issue_counts[previous[0]] -= 1
+            open_counts[previous[0]] -= previous[1]
+        issue_counts[current[0]] += 1
+        open_counts[current[0]] += current[1]
+        issue._counted_state = current
+    for project_id in issue_counts.keys() | open_counts.keys():
+        adjust_project(project_id, issue_counts[project_id], open_counts[project_id])
+
+
+def delete_issues(queryset):
+    """
+    Delete issues, along with their comments, and account for them with a
+    single update per project instead of one per issue.
+    """
+    with transaction.atomic(savepoint=False):
+        counts = (
+            queryset.order_by()
+            .values("project_id")
+            .annotate(
+                issues=Count("id"), open_issues=Count("id", filter=Q(status="open"))
+            )
+        )
+        counts = list(counts)
+        token = batch_deleting.set(True)
+        try:
+            deleted = queryset.delete()
+        finally:
+            batch_deleting.reset(token)
+        for row in counts:
+            adjust_project(row["project_id"], -row["issues"], -row["open_issues"])
+    return deleted
+
+
+def uncount_issue(issue):
+    project_id, is_open = getattr(issue, "_counted_state", issue.counted_state)
+    adjust_project(project_id, -1, -is_open)
+
+
+def count_comment(comment):
+    previous = getattr(comment, "_counted_state", None)
+    current = comment.counted_state
+    if previous == current:
+        return
+    if previous is not None:
+        adjust_issue(previous, -1)
+    adjust_issue(current, 1)
+    comment._counted_state = current
+
+
+def uncount_comment(comment):
+    adjust_issue(getattr(comment, "_counted_state", comment.counted_state), -1)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("id")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("id"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recount():
+    """
+    Recompute the counters that drifted from the rows they count, and return
+    the number of projects and issues that were repaired.
+    """
+    project_counts = {
+        "issue_count": _count(Issue.objects.all(), "project"),
+        "open_issue_count": _count(Issue.objects.filter(status="open"), "project"),
+    }
+    issue_counts = {"comment_count": _count(Comment.objects.all(), "issue")}
+    repaired = []
+    for model, counts in ((Project, project_counts), (Issue, issue_counts)):
+        actual = {f"actual_{name}": count for name, count in counts.items()}
+        drifted = Q()
+        for name in counts:
+            drifted |= ~Q(**{name: F(f"actual_{name}")})
+        ids = list(
+            model.objects.annotate(**actual)
+            .filter(drifted)
+            .values_list("id", flat=True)
+        )
+        if ids:
+            repaired_rows = model.objects.filter(id__in=ids)
+            project_ids = (
+                ids
+                if model is Project
+                else set(repaired_rows.values_list("project_id", flat=True))
+            )
+            repaired_rows.update(**counts, updated_time=timezone.now())
+            # Cached responses hold the drifted counters
+            for project_id in project_ids:
+                response_cache.invalidate(project_id)
+        repaired.append(len(ids))
+    return tuple(repaired)
@@ -0,0 +1,117 @@
+"""
+Streaming export of a whole project: the project, then its issues, then their
+comments.
+
+Rows are read with ``values()`` and ``iterator(chunk_size=...)`` and encoded
+one at a time, so the memory used doesn't depend on the size of the project.
+"""
+import csv
+import json
+
+from django.db.models import F
+from rest_framework import serializers
+
+from .models import Comment, Issue, Project
+
+CHUNK_SIZE = 2000
+
+# Same representation as the API
+_datetime = serializers.DateTimeField().to_representation
+
+
+def _convert_datetimes(row):
+    for name in ("created_time", "updated_time"):
+        if row.get(name) is not None:
+            row[name] = _datetime(row[name])
+    return row
+
+
+EXPORTS = [
+    (
+        "project",
+        Project,
+        (
+            "id",
+            "title",
+            "description",
+            "type",
+            "author_user",
+            "issue_count",
+            "open_issue_count",
+            "updated_time",
+        ),
+    ),
+    (
+        "issue",
+        Issue,
+        (
+            "id",
+            "title",
+            "desc",
+            "tag",
+            "priority",
+            "status",
+            "author_user",
+            "assignee_user",
+            "comment_count",
+            "created_time",
+            "updated_time",
+        ),
+    ),
+    (
+        "comment",
+        Comment,
+        ("id", "issue", "description", "author_user", "created_time", "updated_time"),
+    ),
+]
+
+COLUMNS = ["record"]
+for _, _, fields in EXPORTS:
+    COLUMNS += [field for field in (*fields, "author_username") if field not in COLUMNS]
+
+
+def export_rows(project_id):
+    """
+    Yield the rows of the project as dicts, whose "record" key tells the type
+    of object they hold.
+    """
+    for record, model, fields in EXPORTS:
+        if model is Project:
+            queryset = model.objects.filter(id=project_id)
+        else:
+            queryset = model.objects.filter(project_id=project_id)
+        rows = (
+            queryset.order_by("id")
+            .values(*fields, author_username=F("author_user__username"))
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        for row in rows:
+            yield _convert_datetimes({"record": record, **row})
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class _Echo:
+    # File-like object handing back what the csv writer writes
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """
+    One CSV table for every row type: the columns are the union of the fields
+    of the rows, left empty where a row type has no such field.
+    """
+    writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
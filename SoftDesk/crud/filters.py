@@ -0,0 +1,33 @@
+from django_filters import rest_framework as filters
+
+from .models import Issue
+
+
+class IssueFilter(filters.FilterSet):
+    """
+    Filters of the issue list of a project.
+
+    Choice filters accept several values (``?status=open&status=in progress``).
+    Users are filtered by id without being loaded, and ``created_time`` takes a
+    range with ``created_time_after`` and ``created_time_before``. The
+    (project, status, priority) and (project, assignee_user, status) indexes of
+    Issue serve the common combinations, in keyset pagination order.
+    """
+
+    status = filters.MultipleChoiceFilter(choices=Issue.STATUS_CHOICES)
+    priority = filters.MultipleChoiceFilter(choices=Issue.PRIORITY_CHOICES)
+    tag = filters.MultipleChoiceFilter(choices=Issue.TAG_CHOICES)
+    assignee_user = filters.NumberFilter(field_name="assignee_user_id")
+    author_user = filters.NumberFilter(field_name="author_user_id")
+    created_time = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Issue
+        fields = [
+            "status",
+            "priority",
+            "tag",
+            "assignee_user",
+            "author_user",
+            "created_time",
+        ]
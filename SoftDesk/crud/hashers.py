@@ -0,0 +1,136 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+    check_password,
+    make_password,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+def hashing_option(name):
+    return settings.PASSWORD_HASHING[name]
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count of settings.PASSWORD_HASHING."""
+
+    @property
+    def iterations(self):
+        return hashing_option("PBKDF2_ITERATIONS")
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with the cost parameters of settings.PASSWORD_HASHING."""
+
+    @property
+    def work_factor(self):
+        return hashing_option("SCRYPT_WORK_FACTOR")
+
+    @property
+    def block_size(self):
+        return hashing_option("SCRYPT_BLOCK_SIZE")
+
+    @property
+    def parallelism(self):
+        return hashing_option("SCRYPT_PARALLELISM")
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with the cost parameters of settings.PASSWORD_HASHING."""
+
+    @property
+    def time_cost(self):
+        return hashing_option("ARGON2_TIME_COST")
+
+    @property
+    def memory_cost(self):
+        return hashing_option("ARGON2_MEMORY_COST")
+
+    @property
+    def parallelism(self):
+        return hashing_option("ARGON2_PARALLELISM")
+
+
+class PasswordPoolSaturated(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ins in progress, try again shortly."
+    default_code = "password_pool_saturated"
+
+
+class PasswordWorkerPool:
+    """
+    Bounded pool of threads running password hashing.
+
+    Hashing releases the GIL, so the workers use spare cores. The request
+    thread of a caller blocks until its password is hashed, so at most
+    ``workers`` passwords are hashed at once and ``queue_size`` more may wait;
+    beyond that callers get PasswordPoolSaturated right away. Keeping
+    ``workers + queue_size`` well below the threads of the server leaves the
+    others free to serve other requests during a login storm.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            hashing_option("WORKERS"),
+            hashing_option("QUEUE_SIZE"),
+            hashing_option("TIMEOUT"),
+        )
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolSaturated()
+
+        def task():
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise PasswordPoolSaturated()
+
+    def make_password(self, password):
+        return self.run(make_password, password)
+
+    def verify_password(self, password, encoded):
+        """
+        Check a password against its encoded hash.
+
+        Returns whether it matches and, when the hash was made with another
+        algorithm or cost than the preferred hasher, the password rehashed with
+        it so that the caller can store the upgrade.
+        """
+        return self.run(_verify_password, password, encoded)
+
+
+def _verify_password(password, encoded):
+    rehashed = []
+    is_correct = check_password(
+        password, encoded, setter=lambda raw: rehashed.append(make_password(raw))
+    )
+    return is_correct, rehashed[0] if rehashed else None
+
+
+password_pool = PasswordWorkerPool.from_settings()
@@ -0,0 +1,185 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crud.access import rebuild
+from crud.counters import recount
+from crud.models import Comment, Contributor, Issue, Project, User
+
+WORDS = (
+    "serveur client connexion erreur page base donnees requete lent crash "
+    "timeout cache jeton mot passe projet probleme commentaire utilisateur "
+    "export import fichier image affichage mobile navigateur version mise jour "
+    "test deploiement production configuration journal alerte memoire disque"
+).split()
+
+PROJECT_TYPES = ["back-end", "front-end", "iOS", "Android"]
+ROLES = ["dev", "qa", "design", "ops", "product"]
+
+
+def zipf_weights(count, exponent):
+    # Cumulative weights of ranks 1..count, the first ranks being the heaviest
+    return list(accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, projects, contributors, issues "
+        "and comments. Activity follows a Zipf distribution: a few projects "
+        "hold most of the issues and a few users write most of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=200)
+        parser.add_argument(
+            "--contributors",
+            type=int,
+            default=8,
+            help="Average number of contributors of a project, its author included.",
+        )
+        parser.add_argument("--issues", type=int, default=20000)
+        parser.add_argument("--comments", type=int, default=100000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Exponent of the Zipf distributions, 0 for uniform ones.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of every generated user, hashed once.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        skew = options["skew"]
+
+        with transaction.atomic():
+            users = self.create_users(options["users"], options["password"])
+            user_weights = zipf_weights(len(users), skew)
+            projects = self.create_projects(options["projects"], users, user_weights)
+            members = self.create_contributors(
+                projects, users, user_weights, options["contributors"]
+            )
+            issues = self.create_issues(
+                options["issues"], projects, zipf_weights(len(projects), skew), members
+            )
+            self.create_comments(
+                options["comments"], issues, zipf_weights(len(issues), skew), members
+            )
+            # Bulk inserts send no signal: set every counter and access row at
+            # once
+            recount()
+            rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(users)} user(s), {len(projects)} project(s), "
+                f"{sum(map(len, members.values()))} contributor(s), "
+                f"{len(issues)} issue(s) and {options['comments']} comment(s)."
+            )
+        )
+
+    def sentence(self, words):
+        return " ".join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, count, password):
+        start = User.objects.count()
+        password = make_password(password)
+        return User.objects.bulk_create(
+            (
+                User(username=f"user{start + index}", password=password)
+                for index in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_projects(self, count, users, user_weights):
+        authors = self.random.choices(users, cum_weights=user_weights, k=count)
+        return Project.objects.bulk_create(
+            (
+                Project(
+                    title=self.sentence(3),
+                    description=self.sentence(15),
+                    type=self.random.choice(PROJECT_TYPES),
+                    author_user=author,
+                )
+                for author in authors
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_contributors(self, projects, users, user_weights, average):
+        """
+        Make the author of each project its admin, and add active users as
+        contributors. Return the ids of the contributors of each project.
+        """
+        members = {}
+        contributors = []
+        for project in projects:
+            size = min(len(users), max(1, round(self.random.expovariate(1 / average))))
+            chosen = {project.author_user_id}
+            # Active users contribute to more projects
+            while len(chosen) < size:
+                chosen.add(self.random.choices(users, cum_weights=user_weights)[0].id)
+            members[project.id] = list(chosen)
+            contributors += [
+                Contributor(
+                    user_id=user_id,
+                    project_id=project.id,
+                    permission="admin" if user_id == project.author_user_id else "user",
+                    role="owner"
+                    if user_id == project.author_user_id
+                    else self.random.choice(ROLES),
+                )
+                for user_id in chosen
+            ]
+        Contributor.objects.bulk_create(contributors, batch_size=self.batch_size)
+        return members
+
+    def create_issues(self, count, projects, project_weights, members):
+        # Most issues are still open
+        status_weights = {"open": 5, "in progress": 2, "closed": 3}
+
+        def issue():
+            project = self.random.choices(projects, cum_weights=project_weights)[0]
+            return Issue(
+                title=self.sentence(5),
+                desc=self.sentence(25),
+                tag=self.random.choices(["bug", "feature", "task"], [5, 3, 2])[0],
+                priority=self.random.choices(["low", "medium", "high"], [3, 5, 2])[0],
+                status=self.random.choices(
+                    list(status_weights), list(status_weights.values())
+                )[0],
+                project=project,
+                author_user_id=self.random.choice(members[project.id]),
+                assignee_user_id=self.random.choice(members[project.id]),
+            )
+
+        return Issue.objects.bulk_create(
+            (issue() for _ in range(count)), batch_size=self.batch_size
+        )
+
+    def create_comments(self, count, issues, issue_weights, members):
+        def comment():
+            issue = self.random.choices(issues, cum_weights=issue_weights)[0]
+            return Comment(
+                project_id=issue.project_id,
+                issue_id=issue.id,
+                description=self.sentence(12),
+                author_user_id=self.random.choice(members[issue.project_id]),
+            )
+
+        # Comments are inserted in batches so the rows never all sit in memory
+        for start in range(0, count, self.batch_size):
+            Comment.objects.bulk_create(
+                comment() for _ in range(min(self.batch_size, count - start))
+            )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crud.access import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the effective permissions of users on projects that drifted "
+        "from the authors and contributors of the projects."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} access row(s)."))
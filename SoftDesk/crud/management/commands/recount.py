@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crud.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the issue counters of projects and the comment counters of "
+        "issues that drifted from the rows they count."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            projects, issues = recount()
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {projects} project(s) and {issues} issue(s).")
+        )
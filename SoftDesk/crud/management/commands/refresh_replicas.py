@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from crud.routers import options
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over its read-only replicas. "
+        "PostgreSQL replicas are kept up to date by streaming replication."
+    )
+
+    def handle(self, *args, **options_):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite replicas are copied by this command.")
+
+        primary.ensure_connection()
+        for alias in options()["ALIASES"]:
+            # NAME is "file:<path>?mode=ro"
+            path = connections[alias].settings_dict["NAME"]
+            path = path.removeprefix("file:").partition("?")[0]
+            with sqlite3.connect(path) as replica:
+                primary.connection.backup(replica)
+            replica.close()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {alias} ({path})."))
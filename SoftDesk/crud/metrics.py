@@ -0,0 +1,397 @@
+"""
+Per-route request metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware records, for every request, its latency, the number and
+duration of its SQL queries, the time spent representing objects with
+serializers and rendering the response body, the size of that body, labelled with the URL name of the route from
+SoftDesk/urls.py. Metrics live in the process: each worker exposes its own,
+which Prometheus sums when it scrapes them all.
+
+When PROFILE_SLOWER_THAN is set, a sample of the sync requests runs under
+cProfile, and the stats of those slower than the threshold are dumped to
+PROFILE_DIR, to be read with ``python -m pstats``.
+"""
+import cProfile
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Record metrics of every request
+    "ENABLED": True,
+    # Bearer token required to read the metrics endpoint, None to leave it open
+    "TOKEN": None,
+    # Seconds above which a profiled request dumps its stats, None to disable
+    "PROFILE_SLOWER_THAN": None,
+    # Share of the requests that run under the profiler
+    "PROFILE_SAMPLE_RATE": 0.01,
+    # Directory receiving the .prof files
+    "PROFILE_DIR": "profiles",
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+UNMATCHED = "unmatched"
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+class Histogram:
+    """
+    Cumulative histogram over fixed bucket bounds, with the sum and count of
+    the observed values. Callers hold the lock of the registry.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One count per bound, and one for the values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield format_value(bound), cumulative
+        yield "+Inf", self.count
+
+
+class Registry:
+    """
+    Metrics of the requests served by this process, per route and method.
+    """
+
+    histograms = {
+        "request_duration_seconds": ("Latency of the requests.", LATENCY_BUCKETS),
+        "db_queries": ("SQL queries run by a request.", QUERY_BUCKETS),
+        "response_size_bytes": ("Size of the response bodies.", SIZE_BUCKETS),
+    }
+    counters = {
+        "requests_total": "Requests served, by status code.",
+        "db_alias_queries_total": "SQL queries, by database alias.",
+        "db_query_seconds_total": "Time spent in SQL queries.",
+        "serialize_seconds_total": "Time spent representing objects.",
+        "render_seconds_total": "Time spent rendering response bodies.",
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.histograms}
+            self._counters = {name: {} for name in self.counters}
+
+    def record(self, route, method, status, duration, request_metrics, size):
+        labels = (("route", route), ("method", method))
+        with self._lock:
+            for name, value in (
+                ("request_duration_seconds", duration),
+                ("db_queries", request_metrics.queries),
+                ("response_size_bytes", size),
+            ):
+                histogram = self._histograms[name].get(labels)
+                if histogram is None:
+                    histogram = self._histograms[name][labels] = Histogram(
+                        self.histograms[name][1]
+                    )
+                histogram.observe(value)
+
+            for name, key, value in (
+                ("requests_total", (*labels, ("status", str(status))), 1),
+                ("db_query_seconds_total", labels, request_metrics.query_seconds),
+                (
+                    "serialize_seconds_total",
+                    labels,
+                    request_metrics.serialize_seconds,
+                ),
+                ("render_seconds_total", labels, request_metrics.render_seconds),
+            ):
+                counter = self._counters[name]
+                counter[key] = counter.get(key, 0) + value
+
+            counter = self._counters["db_alias_queries_total"]
+            for alias, queries in request_metrics.aliases.items():
+                key = (*labels, ("alias", alias))
+                counter[key] = counter.get(key, 0) + queries
+
+    def export(self, counters=()):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        ``counters`` holds extra (name, help, labels, value) counter samples.
+        """
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.histograms.items():
+                lines += header(name, help_text, "histogram")
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            sample(f"{name}_bucket", (*labels, ("le", bound)), count)
+                        )
+                    lines.append(sample(f"{name}_sum", labels, histogram.sum))
+                    lines.append(sample(f"{name}_count", labels, histogram.count))
+
+            for name, help_text in self.counters.items():
+                lines += header(name, help_text, "counter")
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(sample(name, labels, value))
+
+        described = set()
+        for name, help_text, labels, value in counters:
+            if name not in described:
+                described.add(name)
+                lines += header(name, help_text, "counter")
+            lines.append(sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def header(name, help_text, kind):
+    return [f"# HELP softdesk_{name} {help_text}", f"# TYPE softdesk_{name} {kind}"]
+
+
+def sample(name, labels, value):
+    pairs = ",".join(f'{key}="{escape_label(value)}"' for key, value in labels)
+    return f"softdesk_{name}{{{pairs}}} {format_value(value)}"
+
+
+def escape_label(value):
+    return re.sub(r'([\\"])', r"\\\1", str(value)).replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Measurements of the request being served."""
+
+    __slots__ = (
+        "queries",
+        "query_seconds",
+        "serialize_seconds",
+        "render_seconds",
+        "aliases",
+        "serializing",
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0
+        # Including the queries run while representing, such as lazy relations
+        self.serialize_seconds = 0
+        self.render_seconds = 0
+        # Queries per database alias
+        self.aliases = {}
+        # Whether a representation is being timed, so nested ones count once
+        self.serializing = False
+
+
+# Set for the duration of a request. Context variables follow the request into
+# the threads sync_to_async runs queries in, so async views are measured too.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    request_metrics = current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.query_seconds += time.perf_counter() - start
+        request_metrics.queries += 1
+        alias = context["connection"].alias
+        request_metrics.aliases[alias] = request_metrics.aliases.get(alias, 0) + 1
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Add the time spent in the block to the serialization time of the current
+    request. Blocks nested in a measured one, such as the child serializers
+    of a list, aren't counted again.
+    """
+    request_metrics = current_request.get()
+    if request_metrics is None or request_metrics.serializing:
+        yield
+        return
+    request_metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.serialize_seconds += time.perf_counter() - start
+        request_metrics.serializing = False
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Record the metrics of every request in the process registry.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = options()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.options["ENABLED"]:
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            profiler = self.start_profiler()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            current_request.reset(token)
+        duration = time.perf_counter() - start
+        self.record(request, response, duration, request_metrics)
+        if profiler is not None:
+            self.dump_profile(request, profiler, duration)
+        return response
+
+    async def __acall__(self, request):
+        if not self.options["ENABLED"]:
+            return await self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # Last hook before the response is rendered: time the rendering from
+        # here to the post-render callbacks
+        request_metrics = current_request.get()
+        if request_metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.render_seconds += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, duration, request_metrics):
+        match = request.resolver_match
+        route = match.url_name if match is not None and match.url_name else UNMATCHED
+        size = 0 if response.streaming else len(response.content)
+        registry.record(
+            route,
+            request.method,
+            response.status_code,
+            duration,
+            request_metrics,
+            size,
+        )
+
+    def start_profiler(self):
+        if self.options["PROFILE_SLOWER_THAN"] is None:
+            return None
+        if random.random() >= self.options["PROFILE_SAMPLE_RATE"]:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return None
+        return profiler
+
+    def dump_profile(self, request, profiler, duration):
+        if duration < self.options["PROFILE_SLOWER_THAN"]:
+            return
+        match = request.resolver_match
+        route = match.url_name if match is not None and match.url_name else UNMATCHED
+        directory = Path(self.options["PROFILE_DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{route}-{request.method}-{time.time_ns()}.prof"
+        profiler.dump_stats(path)
+        logger.warning(
+            "Slow request %s %s took %.3fs, profile dumped to %s",
+            request.method,
+            request.path,
+            duration,
+            path,
+        )
+
+
+def cache_counters():
+    from .cache import membership_cache, response_cache
+
+    for cache_name, stats, keys in (
+        ("membership", membership_cache.stats(), ("hits", "misses", "evictions")),
+        # Evictions of the shared backend aren't seen by the process
+        ("response", response_cache.stats(), ("hits", "misses")),
+    ):
+        for key in keys:
+            yield (
+                f"cache_{key}_total",
+                f"Cache {key} in this process.",
+                (("cache", cache_name),),
+                stats[key],
+            )
+
+
+def metrics_view(request):
+    """Metrics of this process, for Prometheus to scrape."""
+    token = options()["TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.export(cache_counters()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crud", "0002_comment_project"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["issue", "created_time", "id"], name="comment_issue_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issue",
+            index=models.Index(
+                fields=["project", "created_time", "id"],
+                name="issue_project_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crud", "0003_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["project", "created_time", "id"],
+                name="comment_project_created_idx",
+            ),
+        ),
+    ]
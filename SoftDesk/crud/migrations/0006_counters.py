@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 13:49
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("id")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("id"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Project = apps.get_model("crud", "Project")
+    Issue = apps.get_model("crud", "Issue")
+    Comment = apps.get_model("crud", "Comment")
+    db = schema_editor.connection.alias
+    Project.objects.using(db).update(
+        issue_count=count(Issue.objects.using(db), "project"),
+        open_issue_count=count(
+            Issue.objects.using(db).filter(status="open"), "project"
+        ),
+    )
+    Issue.objects.using(db).update(
+        comment_count=count(Comment.objects.using(db), "issue")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crud", "0005_updated_time"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issue",
+            name="comment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="issue_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="open_issue_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# FTS5 external-content tables: the text stays in the issue and comment
+# tables, the triggers keep the index in sync with every write, including bulk
+# ones, and only re-index a row when its text or project changes. The project
+# id is indexed as a token so that searches are restricted to a project by the
+# index itself.
+SEARCH_TABLES = [
+    ("crud_issue", ["title", "desc"]),
+    ("crud_comment", ["description"]),
+]
+
+
+def sqlite_statements(table, columns):
+    indexed = [*columns, "project_id"]
+    names = ", ".join(f'"{column}"' for column in indexed)
+    new = ", ".join(f'new."{column}"' for column in indexed)
+    old = ", ".join(f'old."{column}"' for column in indexed)
+    fts = f"{table}_fts"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    delete = (
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgresql_statements(table, columns):
+    # Must stay identical to SearchTarget.document in crud/search.py
+    text = " || ' ' || ".join(f'"{column}"' for column in columns)
+    return [
+        f"CREATE INDEX {table}_search_idx ON {table} "
+        f"USING GIN (to_tsvector('simple', {text}))"
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCH_TABLES:
+        if vendor == "sqlite":
+            statements = sqlite_statements(table, columns)
+        elif vendor == "postgresql":
+            statements = postgresql_statements(table, columns)
+        else:
+            statements = []
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, _ in SEARCH_TABLES:
+        if vendor == "sqlite":
+            for trigger in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crud", "0006_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
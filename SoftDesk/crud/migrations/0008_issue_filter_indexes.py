@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crud", "0007_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="issue",
+            index=models.Index(
+                fields=["project", "status", "priority", "created_time", "id"],
+                name="issue_project_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="issue",
+            index=models.Index(
+                fields=["project", "assignee_user", "status", "created_time", "id"],
+                name="issue_project_assignee_idx",
+            ),
+        ),
+    ]
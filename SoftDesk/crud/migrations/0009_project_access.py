@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-18 14:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_access(apps, schema_editor):
+    Project = apps.get_model("crud", "Project")
+    Contributor = apps.get_model("crud", "Contributor")
+    ProjectAccess = apps.get_model("crud", "ProjectAccess")
+    db = schema_editor.connection.alias
+    permissions = {
+        (user_id, project_id): permission
+        for user_id, project_id, permission in Contributor.objects.using(
+            db
+        ).values_list("user_id", "project_id", "permission")
+    }
+    # The author of a project is its admin
+    for project_id, author_id in Project.objects.using(db).values_list(
+        "id", "author_user_id"
+    ):
+        permissions[author_id, project_id] = "admin"
+    ProjectAccess.objects.using(db).bulk_create(
+        ProjectAccess(user_id=user_id, project_id=project_id, permission=permission)
+        for (user_id, project_id), permission in permissions.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("crud", "0008_issue_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectAccess",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.CharField(
+                        choices=[("admin", "Admin"), ("user", "User")], max_length=5
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="crud.project"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "project")},
+            },
+        ),
+        migrations.RunPython(backfill_access, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -12,8 +13,103 @@ class Contributor(models.Model):
     class Meta:
         unique_together = ("user", "project")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & {"project_id", "user_id"}:
+            instance._granted_key = instance.granted_key
+        return instance
 
-class Project(models.Model):
+    @property
+    def granted_key(self):
+        # The (project, user) pair crud.access granted the row to
+        return self.project_id, self.user_id
+
+
+class ProjectAccessQuerySet(models.QuerySet):
+    def permissions(self, user, project_ids):
+        """
+        Map the given projects the user may access to the user's permission on
+        them, from a single lookup of the (user, project) index.
+        """
+        return dict(
+            self.filter(user=user, project_id__in=project_ids).values_list(
+                "project_id", "permission"
+            )
+        )
+
+
+class ProjectAccess(models.Model):
+    """
+    Effective permission of a user on a project, merging authorship and
+    contribution: the author of a project is its admin, and the contributors
+    have the permission of their Contributor row.
+
+    Maintained by crud.access on every write to Project and Contributor, so
+    access checks read a single row of the (user, project) index.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    project = models.ForeignKey("Project", on_delete=models.CASCADE)
+    permission = models.CharField(max_length=5, choices=Contributor.PERMISSION_CHOICES)
+
+    objects = ProjectAccessQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("user", "project")
+
+
+class CountersMixin:
+    """
+    Saves of the models holding or feeding the counters of crud.counters.
+
+    The counters updated on post_save are written in the same transaction as
+    the row, and a full save doesn't write back the counters of the instance,
+    which may have been adjusted since it was loaded.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            self.counter_fields
+            and not args
+            and kwargs.get("update_fields") is None
+            and not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
+class ProjectQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Projects authored by the user or to which the user contributes.
+
+        Both are merged in ProjectAccess, so this is a single range of its
+        (user, project) index, and the result stays a plain queryset that can
+        be filtered, ordered and paginated.
+        """
+        accessible = ProjectAccess.objects.filter(user=user).values("project_id")
+        return self.filter(id__in=accessible)
+
+    def touch(self):
+        """
+        Mark the projects as modified without saving them, when a change of
+        their contributors alters their representation and validators.
+        """
+        return self.update(updated_time=timezone.now())
+
+
+class Project(CountersMixin, models.Model):
     title = models.CharField(max_length=100)
     description = models.CharField(max_length=1000)
     type = models.CharField(max_length=10)
@@ -24,8 +120,25 @@ class Project(models.Model):
         User, through=Contributor, related_name="contributed_projects"
     )
 
+    updated_time = models.DateTimeField(auto_now=True)
+
+    # Denormalized counters, maintained by crud.counters
+    issue_count = models.IntegerField(default=0)
+    open_issue_count = models.IntegerField(default=0)
+    counter_fields = ("issue_count", "open_issue_count")
+
+    objects = ProjectQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "author_user_id" not in instance.get_deferred_fields():
+            # Whom crud.access granted the admin permission of the project
+            instance._granted_author_id = instance.author_user_id
+        return instance
+
 
-class Issue(models.Model):
+class Issue(CountersMixin, models.Model):
     title = models.CharField(max_length=100)
     desc = models.CharField(max_length=1000)
     TAG_CHOICES = [("bug", "Bug"), ("feature", "Feature"), ("task", "Task")]
@@ -46,11 +159,76 @@ class Issue(models.Model):
         User, on_delete=models.CASCADE, related_name="assignee_issues"
     )
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
 
+    # Denormalized counter, maintained by crud.counters
+    comment_count = models.IntegerField(default=0)
+    counter_fields = ("comment_count",)
 
-class Comment(models.Model):
+    class Meta:
+        indexes = [
+            # Keyset pagination of a project's issues
+            models.Index(
+                fields=["project", "created_time", "id"],
+                name="issue_project_created_idx",
+            ),
+            # Issue list filtered by status and priority, e.g. open high-priority
+            # issues, in keyset pagination order
+            models.Index(
+                fields=["project", "status", "priority", "created_time", "id"],
+                name="issue_project_status_idx",
+            ),
+            # Issue list of an assignee, optionally filtered by status
+            models.Index(
+                fields=["project", "assignee_user", "status", "created_time", "id"],
+                name="issue_project_assignee_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        deferred = instance.get_deferred_fields()
+        if not deferred & {"project_id", "status"}:
+            instance._counted_state = instance.counted_state
+        return instance
+
+    @property
+    def counted_state(self):
+        # What the counters of the project account for
+        return self.project_id, self.status == "open"
+
+
+class Comment(CountersMixin, models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     description = models.CharField(max_length=1000)
     author_user = models.ForeignKey(User, on_delete=models.CASCADE)
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE)
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of an issue's comments
+            models.Index(
+                fields=["issue", "created_time", "id"],
+                name="comment_issue_created_idx",
+            ),
+            # Keyset pagination of a project's comment feed
+            models.Index(
+                fields=["project", "created_time", "id"],
+                name="comment_project_created_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "issue_id" not in instance.get_deferred_fields():
+            instance._counted_state = instance.counted_state
+        return instance
+
+    @property
+    def counted_state(self):
+        # What the counters of the issue account for
+        return self.issue_id
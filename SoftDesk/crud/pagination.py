@@ -0,0 +1,194 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination over (created_time, id).
+
+    Each page is fetched with a range predicate on the last seen key instead of
+    an OFFSET, so with a matching (parent, created_time, id) index every page
+    costs the same no matter how deep it is. The total count is only computed
+    when the client asks for it with ``?count=true``.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        if self.count_requested:
+            self.count = queryset.count()
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of paginate_queryset.
+        """
+        page_queryset = self.get_page_queryset(queryset, request)
+        if self.count_requested:
+            self.count = await queryset.acount()
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the queryset of the requested page, plus one extra row telling
+        whether another page follows.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        self.count_requested = request.query_params.get(self.count_query_param) in (
+            "1",
+            "true",
+        )
+
+        self.cursor = cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor["reverse"]
+        if cursor is not None:
+            created_time, pk = cursor["created_time"], cursor["id"]
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(created_time__lt=created_time)
+                    | Q(created_time=created_time, id__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_time__gt=created_time)
+                    | Q(created_time=created_time, id__gt=pk)
+                )
+
+        if self.reverse:
+            queryset = queryset.order_by("-created_time", "-id")
+        else:
+            queryset = queryset.order_by("created_time", "id")
+
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            return {
+                "created_time": datetime.fromisoformat(cursor["t"]),
+                "id": int(cursor["i"]),
+                "reverse": bool(cursor["r"]),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        if isinstance(row, dict):
+            created_time, pk = row["created_time"], row["id"]
+        else:
+            created_time, pk = row.created_time, row.id
+        cursor = json.dumps(
+            {"t": created_time.isoformat(), "i": pk, "r": int(reverse)},
+            separators=(",", ":"),
+        )
+        encoded = base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class AsyncLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination usable from async views.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [row async for row in queryset[self.offset : self.offset + self.limit]]
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination of ranked search results, whose pages can't be keyed
+    on (created_time, id). The limit is capped so that a page is loaded with a
+    bounded IN list.
+    """
+
+    max_limit = 100
@@ -1,47 +1,87 @@
-from rest_framework import generics, permissions, status
+from rest_framework import exceptions, generics, permissions, status
 
-from .models import Contributor, Project
+from .cache import membership_cache
 
 
-class IsProjectContributor(permissions.BasePermission):
+def get_project_permission(request, project_id):
     """
-    Custom permission to only allow contributors of a project to modify it.
+    Return the effective permission of the requesting user on a project.
+
+    The permission is resolved once per request through the process-wide
+    membership cache and memoized on the request, so every later permission
+    check for the same project is answered from memory. Returns None when the
+    user has no access to the project.
     """
+    resolved = getattr(request, "_project_permissions", None)
+    if resolved is None:
+        resolved = request._project_permissions = {}
 
-    def has_object_permission(self, request, view, obj):
-        print("Checking if user is contributor")
-        # Get the project_id from the obj
-        if hasattr(obj, "project_id"):
-            project_id = obj.project_id
-        else:
-            project_id = obj.id
+    if project_id not in resolved:
+        resolved[project_id] = membership_cache.get_permission(
+            request.user.id, project_id
+        )
+    return resolved[project_id]
 
-        try:
-            contributor = Contributor.objects.get(
-                user_id=request.user.id, project_id=project_id
-            )
-            if contributor.permission == "admin" or obj.author_user == request.user:
-                return True
 
-            if contributor.permission == "user":
-                return (
-                    request.method in permissions.SAFE_METHODS
-                    or request.method == "POST"
-                )
+async def aget_project_permission(request, project_id):
+    """
+    Async variant of get_project_permission.
+    """
+    resolved = getattr(request, "_project_permissions", None)
+    if resolved is None:
+        resolved = request._project_permissions = {}
+
+    if project_id not in resolved:
+        resolved[project_id] = await membership_cache.aget_permission(
+            request.user.id, project_id
+        )
+    return resolved[project_id]
 
-        except Contributor.DoesNotExist:
-            return obj.author_user == request.user
 
-        return False
+def check_project_admin(request, project_id):
+    """
+    Deny the request unless the user is an admin of the project. Guards the
+    writes of contributors, by which users could otherwise make themselves
+    admins.
+    """
+    if get_project_permission(request, project_id) != "admin":
+        raise exceptions.PermissionDenied()
 
 
-class IsAuthor(permissions.BasePermission):
+def is_allowed(permission, is_author, method):
     """
-    Custom permission to only allow author and admin contributors of a project to modify it.
+    Whether an effective permission (None without access) grants the request
+    method on an object, the author of the object being always allowed.
     """
+    if permission is None:
+        return is_author
 
-    def has_object_permission(self, request, view, obj):
-        return obj.author_user == request.user
+    if permission == "admin" or is_author:
+        return True
 
+    if permission == "user":
+        return method in permissions.SAFE_METHODS or method == "POST"
+
+    return False
+
+
+class HasProjectAccess(permissions.BasePermission):
+    """
+    Allow a request on a project, or on one of its contributors, issues or
+    comments, according to the effective permission of the user on the
+    project: admins may do anything, users may read and create, and authors
+    may always change their own objects.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        # Get the project_id from the obj
+        if hasattr(obj, "project_id"):
+            project_id = obj.project_id
+        else:
+            project_id = obj.id
 
+        # Compare ids so the author doesn't have to be fetched from the database
+        is_author = getattr(obj, "author_user_id", None) == request.user.id
 
+        permission = get_project_permission(request, project_id)
+        return is_allowed(permission, is_author, request.method)
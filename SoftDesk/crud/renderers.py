@@ -0,0 +1,68 @@
+"""
+JSON renderer and parser backed by orjson when it's installed.
+
+Both fall back to DRF's stdlib implementations when orjson isn't available,
+or for the cases orjson doesn't cover the same way: indented or non-compact
+output, ASCII-only output, non-UTF-8 request bodies, and values orjson can't
+encode. Datetimes, Decimals and the other types DRF's encoder knows are
+handed to that encoder, so both renderers produce the same bytes.
+"""
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if orjson is not None:
+    # Non-string keys aren't enabled: they slow every dump down, and the rare
+    # data that has them falls back to DRF
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# Escaped by DRF so that the output is a strict subset of JavaScript
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits or non-string keys
+            return super().render(data, accepted_media_type, renderer_context)
+        # Both separators start with this byte, which is much faster to look
+        # for than the whole sequences
+        if b"\xe2" in ret:
+            for separator, escaped in LINE_SEPARATORS:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("_", "-") != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,161 @@
+"""
+Routing of reads to the database replicas listed in DATABASE_REPLICAS.
+
+ReplicaMiddleware picks a replica for each request with a safe method, and
+every query of that request reads from it, so the request sees a single
+snapshot. A user that wrote within the last PIN_SECONDS reads from the
+primary instead, so that replication lag never hides their own writes. Writes,
+and reads inside a transaction, always go to the primary.
+"""
+import contextvars
+import logging
+import random
+from contextlib import contextmanager
+
+import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Aliases from DATABASES holding read-only copies of the primary
+    "ALIASES": [],
+    # Seconds a user reads from the primary after writing, longer than the
+    # replication lag
+    "PIN_SECONDS": 5,
+    # Alias from CACHES remembering who wrote, shared between processes. None
+    # leaves every read on the primary.
+    "BACKEND": None,
+}
+
+# Alias the current request reads from, None for the primary
+read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, "DATABASE_REPLICAS", {})}
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary within the block."""
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def token_user_id(request):
+    """
+    Id of the user of the bearer token of a request, or None.
+
+    The signature isn't verified: the id only decides where the user reads
+    from, and the view authenticates the token on its own.
+    """
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme != "Bearer" or not token:
+        return None
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    return claims.get(settings.SIMPLE_JWT.get("USER_ID_CLAIM", "user_id"))
+
+
+class ReplicaMiddleware:
+    """
+    Route the reads of safe requests to a replica, and pin users that write to
+    the primary for PIN_SECONDS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = options()
+        self.aliases = config["ALIASES"]
+        self.pin_seconds = config["PIN_SECONDS"]
+        if config["BACKEND"] is None:
+            if self.aliases:
+                logger.warning(
+                    "DATABASE_REPLICAS has no shared cache BACKEND to pin the "
+                    "users that write: reads stay on the primary."
+                )
+            # A user could otherwise miss their own writes
+            self.aliases = []
+            self.cache = None
+        else:
+            self.cache = caches[config["BACKEND"]]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pin_key(self, user_id):
+        return f"crud:replica:pin:{user_id}"
+
+    def read_alias_for(self, request, user_id):
+        if user_id is not None and self.cache.get(self._pin_key(user_id)):
+            return None
+        return random.choice(self.aliases)
+
+    def pin(self, user_id, response):
+        if user_id is not None and response.status_code < 400:
+            self.cache.set(self._pin_key(user_id), True, self.pin_seconds)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.aliases:
+            return self.get_response(request)
+
+        user_id = token_user_id(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            self.pin(user_id, response)
+            return response
+
+        token = read_alias.set(self.read_alias_for(request, user_id))
+        try:
+            return self.get_response(request)
+        finally:
+            read_alias.reset(token)
+
+    async def __acall__(self, request):
+        if not self.aliases:
+            return await self.get_response(request)
+
+        user_id = token_user_id(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            self.pin(user_id, response)
+            return response
+
+        token = read_alias.set(self.read_alias_for(request, user_id))
+        try:
+            return await self.get_response(request)
+        finally:
+            read_alias.reset(token)
@@ -0,0 +1,144 @@
+"""
+Full-text search over the issues and comments of a project.
+
+On SQLite, matches come from the FTS5 tables created by migration 0007, which
+triggers keep in sync with the issue and comment tables, and are ranked with
+bm25. On PostgreSQL, they come from the GIN indexes over the ``to_tsvector``
+expressions of the same migration, and are ranked with ``ts_rank``. Other
+databases fall back to unranked ``icontains`` lookups.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Comment, Issue
+
+TERM = re.compile(r"\w+")
+
+# Text search configuration of the PostgreSQL indexes: the text is French and
+# English, so words are only lowercased, not stemmed
+POSTGRES_CONFIG = "simple"
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    model: type
+    table: str
+    columns: tuple
+    # bm25 weights of the columns, so that a match in a title ranks first
+    weights: tuple
+
+    @property
+    def fts_table(self):
+        return f"{self.table}_fts"
+
+    @property
+    def document(self):
+        # Must stay identical to the expression of the PostgreSQL index
+        text = " || ' ' || ".join(f'"{column}"' for column in self.columns)
+        return f"to_tsvector('{POSTGRES_CONFIG}', {text})"
+
+
+TARGETS = {
+    "issues": SearchTarget(Issue, "crud_issue", ("title", "desc"), (10.0, 1.0)),
+    "comments": SearchTarget(Comment, "crud_comment", ("description",), (1.0,)),
+}
+
+
+def search_terms(query):
+    return TERM.findall(query or "")
+
+
+class SearchResults:
+    """
+    The matches of the terms in a project, best first.
+
+    Counted and sliced like a queryset so that DRF pagination classes can page
+    through it; each slice runs one ranked query for the ids of the page and
+    loads them from the given queryset.
+    """
+
+    def __init__(self, queryset, target, project_id, terms):
+        self.queryset = queryset
+        self.target = target
+        self.project_id = int(project_id)
+        self.terms = terms
+        self.vendor = connections[queryset.db].vendor
+
+    def count(self):
+        if self.vendor == "sqlite":
+            sql = (
+                f"SELECT COUNT(*) FROM {self.target.fts_table} "
+                f"WHERE {self.target.fts_table} MATCH %s"
+            )
+            params = [self.fts_query()]
+        elif self.vendor == "postgresql":
+            sql = (
+                f"SELECT COUNT(*) FROM {self.target.table} "
+                f"WHERE project_id = %s AND {self.target.document} "
+                f"@@ plainto_tsquery('{POSTGRES_CONFIG}', %s)"
+            )
+            params = [self.project_id, " ".join(self.terms)]
+        else:
+            return self.fallback_queryset().count()
+        return self.fetch(sql, params)[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError("Search results can only be sliced")
+        offset = key.start or 0
+        limit = key.stop - offset if key.stop is not None else -1
+        if self.vendor == "sqlite":
+            sql = (
+                f"SELECT rowid FROM {self.target.fts_table} "
+                f"WHERE {self.target.fts_table} MATCH %s "
+                f"ORDER BY bm25({self.target.fts_table}, "
+                f"{', '.join(map(str, self.target.weights))}, 0.0), rowid "
+                "LIMIT %s OFFSET %s"
+            )
+            params = [self.fts_query(), limit, offset]
+        elif self.vendor == "postgresql":
+            sql = (
+                f"SELECT id FROM {self.target.table}, "
+                f"plainto_tsquery('{POSTGRES_CONFIG}', %s) query "
+                f"WHERE project_id = %s AND {self.target.document} @@ query "
+                f"ORDER BY ts_rank({self.target.document}, query) DESC, id "
+                f"LIMIT {'ALL' if limit < 0 else '%s'} OFFSET %s"
+            )
+            params = [" ".join(self.terms), self.project_id]
+            params += [offset] if limit < 0 else [limit, offset]
+        else:
+            return list(self.fallback_queryset()[key])
+        ids = [row[0] for row in self.fetch(sql, params)]
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    def fts_query(self):
+        """
+        The FTS5 query matching every term in the text columns of the rows of
+        the project. Terms are quoted so that user input is never read as FTS5
+        syntax, and the project id is indexed as a token so that the project
+        restriction is resolved by the index too.
+        """
+        terms = " ".join(f'"{term}"' for term in self.terms)
+        columns = " ".join(self.target.columns)
+        return f'project_id : "{self.project_id}" AND {{{columns}}} : ({terms})'
+
+    def fallback_queryset(self):
+        queryset = self.queryset.filter(project_id=self.project_id)
+        for term in self.terms:
+            match = Q()
+            for column in self.target.columns:
+                match |= Q(**{f"{column}__icontains": term})
+            queryset = queryset.filter(match)
+        return queryset.order_by("-id")
+
+    def fetch(self, sql, params):
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
@@ -1,18 +1,361 @@
-from rest_framework import serializers
+from collections.abc import Mapping
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Contributor, Project, Issue, Comment, User
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from .hashers import password_pool
+from .metrics import measure_serialization
+
+
+class QueryShapingMixin:
+    """
+    Let list views load exactly what the serializer reads.
+
+    Relations named in ``Meta.select_related`` are joined, many-to-many fields
+    are prefetched with their primary keys only, and the selected columns are
+    restricted to the readable fields so that representing a page costs a
+    constant number of queries.
+    """
+
+    @property
+    def data(self):
+        with measure_serialization():
+            return super().data
+
+    @classmethod
+    def shape_queryset(cls, queryset):
+        select_related = getattr(cls.Meta, "select_related", ())
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        columns = ["id"]
+        for field in cls().fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                related_model = queryset.model._meta.get_field(
+                    field.source
+                ).related_model
+                queryset = queryset.prefetch_related(
+                    Prefetch(field.source, queryset=related_model.objects.only("id"))
+                )
+            elif field.source == "*" or isinstance(
+                field, serializers.SerializerMethodField
+            ):
+                # The field may read anything from the instance
+                return queryset
+            else:
+                columns.append("__".join(field.source_attrs))
+        return queryset.only(*columns)
+
+    @classmethod
+    def values_representation(cls):
+        return values_representation(cls)
+
+    @classmethod
+    def values_queryset(cls, queryset):
+        """
+        The rows of queryset as read by the values representation of the
+        serializer, or queryset itself when the serializer has none.
+        """
+        representation = cls.values_representation()
+        if representation is None:
+            return queryset
+        return representation.values(queryset)
+
+
+# Fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+# Fields that represent objects rather than database values
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.MultipleChoiceField,
+    serializers.SerializerMethodField,
+)
+
+
+class ValuesRepresentation:
+    """
+    Read-only representation of a model serializer built from ``values()``
+    rows.
+
+    The readable fields of the serializer are compiled once into the lookups
+    to read and a converter per field, so representing a row is a loop over
+    plain tuples instead of a serializer and a field lookup per object. The
+    output is the same as the serializer's. Many-to-many fields are read with
+    one query per page, the same as their prefetch.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = []
+        self.many = []
+        for field in serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                relation = model._meta.get_field(field.source)
+                self.many.append((field.field_name, relation))
+                self.fields.append((field.field_name, None, None))
+            else:
+                lookup = self.get_lookup(model, field)
+                self.fields.append((field.field_name, lookup, self.converter(field)))
+        self.lookups = list(
+            dict.fromkeys(lookup for _, lookup, _ in self.fields if lookup)
+        )
+
+    @staticmethod
+    def get_lookup(model, field):
+        # The source must be a column of the model or of a related model
+        if field.source == "*":
+            raise TypeError(f"Field {field.field_name!r} reads the whole instance")
+        for attr in field.source_attrs:
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise TypeError(f"Field {field.field_name!r} isn't a column")
+            model = model_field.related_model
+        return "__".join(field.source_attrs)
+
+    @staticmethod
+    def converter(field):
+        """
+        The converter of the database values of field, or None when they are
+        represented as is.
+        """
+        if (
+            isinstance(field, serializers.PrimaryKeyRelatedField)
+            and field.pk_field is None
+        ):
+            # The value is the primary key itself
+            return None
+        if isinstance(field, (serializers.RelatedField, *UNSUPPORTED_FIELDS)):
+            raise TypeError(f"Field {field.field_name!r} represents an object")
+        if isinstance(field, IDENTITY_FIELDS):
+            return None
+        if (
+            isinstance(field, serializers.DateTimeField)
+            and str(getattr(field, "format", api_settings.DATETIME_FORMAT)).lower()
+            == ISO_8601
+            and settings.USE_TZ
+            and not hasattr(field, "timezone")
+        ):
+            return iso_datetime
+        return field.to_representation
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.lookups)
+
+    def represent(self, rows, related=None):
+        with measure_serialization():
+            return self._represent(rows, related)
+
+    def _represent(self, rows, related):
+        if related is None:
+            related = {
+                name: self.group_related(relation, self.related_rows(relation, rows))
+                for name, relation in self.many
+            }
+        # The current time zone is looked up once per page
+        current_timezone = timezone.get_current_timezone()
+        fields = [
+            (
+                name,
+                lookup,
+                partial(iso_datetime, tz=current_timezone)
+                if convert is iso_datetime
+                else convert,
+            )
+            for name, lookup, convert in self.fields
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in fields:
+                if lookup is None:
+                    item[name] = related[name].get(row["id"], [])
+                    continue
+                value = row[lookup]
+                if convert is None or value is None:
+                    item[name] = value
+                else:
+                    item[name] = convert(value)
+            data.append(item)
+        return data
+
+    async def arepresent(self, rows):
+        related = {}
+        for name, relation in self.many:
+            queryset = self.related_rows(relation, rows)
+            related[name] = self.group_related(
+                relation, [row async for row in queryset]
+            )
+        return self.represent(rows, related)
+
+    def related_rows(self, relation, rows):
+        # The same query as the prefetch of the instance path, so the related
+        # keys come in the same order
+        reverse = relation.related_query_name()
+        return relation.related_model._default_manager.filter(
+            **{f"{reverse}__in": [row["id"] for row in rows]}
+        ).values_list(reverse, "pk")
+
+    @staticmethod
+    def group_related(relation, pairs):
+        grouped = {}
+        for owner, pk in pairs:
+            grouped.setdefault(owner, []).append(pk)
+        return grouped
+
+
+def iso_datetime(value, tz):
+    # DateTimeField.to_representation in ISO 8601, without the checks that
+    # the aware datetimes read from the database don't need
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
 
+@lru_cache(maxsize=None)
+def values_representation(serializer_class):
+    try:
+        return ValuesRepresentation(serializer_class)
+    except TypeError:
+        return None
 
-class ContributorSerializer(serializers.ModelSerializer):
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    List serializer representing ``values()`` rows with the values
+    representation of its child, and instances as usual.
+    """
+
+    @property
+    def data(self):
+        with measure_serialization():
+            return super().data
+
+    def to_representation(self, data):
+        representation = self.child.values_representation()
+        if (
+            representation is not None
+            and isinstance(data, list)
+            and data
+            and isinstance(data[0], Mapping)
+        ):
+            return representation.represent(data)
+        return super().to_representation(data)
+
+
+class PreloadedRelation:
+    """
+    Stand-in queryset answering the pk lookups of a related field from rows
+    loaded up front with a single query.
+    """
+
+    def __init__(self, queryset, pks):
+        self.model = queryset.model
+        self.rows = queryset.in_bulk(pks)
+
+    def get(self, pk):
+        try:
+            return self.rows[int(pk)]
+        except KeyError:
+            raise self.model.DoesNotExist
+
+    def all(self):
+        return self
+
+
+class BulkListSerializer(ValuesListSerializer):
+    """
+    List serializer validating and writing a whole batch at once.
+
+    Related objects of every item are loaded with one query per relation
+    before validation, rows are inserted with ``bulk_create`` and updates are
+    written with ``bulk_update``. Updates expect ``instance`` to be a list
+    aligned with the submitted items.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload_relations(data)
+        return super().to_internal_value(data)
+
+    def preload_relations(self, data):
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(
+                field, serializers.PrimaryKeyRelatedField
+            ):
+                continue
+            pks = {
+                item[name]
+                for item in data
+                if isinstance(item, dict) and str(item.get(name, "")).isdigit()
+            }
+            field.queryset = PreloadedRelation(field.get_queryset(), pks)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create(model(**item) for item in validated_data)
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        # bulk_update doesn't refresh auto_now columns on its own
+        auto_now = [
+            field
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+        fields = {field.name for field in auto_now}
+        for instance, item in zip(instances, validated_data):
+            for name, value in item.items():
+                setattr(instance, name, value)
+            for field in auto_now:
+                field.pre_save(instance, add=False)
+            fields.update(item)
+        if fields:
+            model.objects.bulk_update(instances, fields)
+        return instances
+
+
+class ContributorSerializer(QueryShapingMixin, serializers.ModelSerializer):
     class Meta:
         model = Contributor
         fields = "__all__"
+        list_serializer_class = ValuesListSerializer
         extra_kwargs = {
             "project": {"write_only": True},
         }
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ContributorImportSerializer(serializers.ModelSerializer):
+    """
+    Row of a bulk contributor import. Existing contributors are updated, so
+    the (user, project) uniqueness isn't validated.
+    """
+
+    class Meta:
+        model = Contributor
+        fields = ("user", "permission", "role")
+        validators = []
+        list_serializer_class = BulkListSerializer
+
+
+class ProjectSerializer(QueryShapingMixin, serializers.ModelSerializer):
     author_user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), write_only=True, required=False
     )
@@ -22,21 +365,39 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ("issue_count", "open_issue_count")
+        list_serializer_class = ValuesListSerializer
         extra_kwargs = {
             "author_user": {"write_only": True},
         }
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(QueryShapingMixin, serializers.ModelSerializer):
+    author_username = serializers.CharField(
+        source="author_user.username", read_only=True
+    )
+    assignee_username = serializers.CharField(
+        source="assignee_user.username", read_only=True
+    )
+
     class Meta:
         model = Issue
         fields = "__all__"
+        read_only_fields = ("comment_count",)
+        select_related = ("author_user", "assignee_user")
+        list_serializer_class = BulkListSerializer
+
 
+class CommentSerializer(QueryShapingMixin, serializers.ModelSerializer):
+    author_username = serializers.CharField(
+        source="author_user.username", read_only=True
+    )
 
-class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = "__all__"
+        select_related = ("author_user",)
+        list_serializer_class = ValuesListSerializer
 
 
 class UserCreateSerializer(UserCreationForm):
@@ -45,7 +406,9 @@ class UserCreateSerializer(UserCreationForm):
         fields = ("username", "email", "password1", "password2")
 
     def save(self, commit=True):
-        user = super().save(commit=False)
+        # Skip UserCreationForm.save() so the password is hashed on the pool
+        user = forms.ModelForm.save(self, commit=False)
+        user.password = password_pool.make_password(self.cleaned_data["password1"])
         user.email = self.cleaned_data["email"]
         if commit:
             user.save()
@@ -0,0 +1,130 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import access, counters
+from .cache import membership_cache, response_cache
+from .models import Comment, Contributor, Issue, Project, User
+
+
+# Access rows are written before the caches built from them are invalidated
+
+
+@receiver(pre_save, sender=Contributor)
+def load_granted_key(sender, instance, raw, **kwargs):
+    # The pair the row was granted to, when the save moves it to another user
+    # or project
+    previous = getattr(instance, "_granted_key", None)
+    instance._moved_from = None if previous == instance.granted_key else previous
+
+
+@receiver(post_save, sender=Contributor)
+def grant_contributor_access(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if instance._moved_from is not None:
+        access.grant(*instance._moved_from, None)
+    access.grant(instance.project_id, instance.user_id, instance.permission, created)
+    instance._granted_key = instance.granted_key
+
+
+@receiver(post_delete, sender=Contributor)
+def revoke_contributor_access(sender, instance, origin=None, **kwargs):
+    # The access rows are deleted along with the project or the user
+    if not deleted_with(origin, Project, User):
+        access.grant(instance.project_id, instance.user_id, None)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def touch_contributor_project(sender, instance, raw=False, origin=None, **kwargs):
+    # The contributors are part of the representation of the project
+    if raw or deleted_with(origin, Project):
+        return
+    project_ids = {instance.project_id}
+    moved_from = getattr(instance, "_moved_from", None)
+    if moved_from is not None:
+        project_ids.add(moved_from[0])
+    Project.objects.filter(id__in=project_ids).touch()
+
+
+@receiver(post_save, sender=Project)
+def sync_project_access(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    author_id = instance.author_user_id
+    previous = getattr(instance, "_granted_author_id", None)
+    if created:
+        access.grant_author(instance)
+    elif previous != author_id:
+        # The former author keeps the permission of their Contributor row,
+        # if any. Without the former author, check every row of the project.
+        access.sync(
+            instance.id, None if previous is None else [previous, author_id], author_id
+        )
+    instance._granted_author_id = author_id
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def invalidate_contributor_membership(sender, instance, **kwargs):
+    membership_cache.invalidate(instance.project_id, instance.user_id)
+    # Last receiver of the save to need it
+    moved_from = instance.__dict__.pop("_moved_from", None)
+    if moved_from is not None:
+        membership_cache.invalidate(*moved_from)
+        response_cache.invalidate(moved_from[0])
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_memberships(sender, instance, **kwargs):
+    membership_cache.invalidate(instance.id)
+    response_cache.invalidate(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+@receiver([post_save, post_delete], sender=Issue)
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_project_responses(sender, instance, origin=None, **kwargs):
+    # A cascade is covered by the invalidation of the object deleted first
+    parents = [model for model in (Project, Issue) if model is not sender]
+    if not deleted_with(origin, *parents):
+        response_cache.invalidate(instance.project_id)
+
+
+def deleted_with(origin, *models):
+    # Whether the deletion cascades from one of these models, whose counters
+    # are deleted along with it
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+@receiver(pre_save, sender=Issue)
+@receiver(pre_save, sender=Comment)
+def load_counted_state(sender, instance, raw, **kwargs):
+    if not raw:
+        counters.load_counted_state(instance)
+
+
+@receiver(post_save, sender=Issue)
+def count_issue(sender, instance, raw, **kwargs):
+    if not raw:
+        counters.count_issues([instance])
+
+
+@receiver(post_delete, sender=Issue)
+def uncount_issue(sender, instance, origin=None, **kwargs):
+    # A batch deletion accounts for its issues once they are all deleted
+    if not deleted_with(origin, Project) and not counters.batch_deleting.get():
+        counters.uncount_issue(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, raw, **kwargs):
+    if not raw:
+        counters.count_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Project, Issue):
+        counters.uncount_comment(instance)
@@ -0,0 +1,31 @@
+"""
+SQLite backend taking the ``init_command`` and ``transaction_mode`` options
+that Django only supports from 5.1 on, with the same meaning, so that the
+ENGINE can go back to django.db.backends.sqlite3 after upgrading.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop("init_command", None)
+        self.transaction_mode = kwargs.pop("transaction_mode", None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads before writing fails at once with
+        # "database is locked" when another connection wrote in between,
+        # whatever the busy timeout: IMMEDIATE takes the write lock upfront
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
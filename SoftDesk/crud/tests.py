@@ -1,3 +1,1771 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from uuid import UUID
+from unittest import mock, skipUnless
+import csv
+import json
+import tempfile
+import threading
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import counters
+from .authentication import LazyTokenUser
+from .cache import MembershipCache, membership_cache, response_cache
+from .metrics import RequestMetrics, current_request, registry
+from .hashers import PasswordPoolSaturated, PasswordWorkerPool
+from .models import Comment, Contributor, Issue, Project, ProjectAccess, User
+from .renderers import FastJSONParser, FastJSONRenderer
+from .routers import ReplicaMiddleware, ReplicaRouter, read_alias, use_primary
+from .serializers import (
+    CommentSerializer,
+    ContributorSerializer,
+    IssueSerializer,
+    ProjectSerializer,
+    QueryShapingMixin,
+)
+
+
+class CrudTestCase(TestCase):
+    def setUp(self):
+        # Ids are reused between tests, so entries must not leak across them
+        membership_cache.clear()
+        caches["default"].clear()
+        self.author = User.objects.create_user("author")
+        self.member = User.objects.create_user("member")
+        self.outsider = User.objects.create_user("outsider")
+        self.project = Project.objects.create(
+            title="Project",
+            description="Desc",
+            type="back-end",
+            author_user=self.author,
+        )
+        Contributor.objects.create(
+            user=self.author, project=self.project, permission="admin", role="owner"
+        )
+        Contributor.objects.create(
+            user=self.member, project=self.project, permission="user", role="dev"
+        )
+        self.issue = Issue.objects.create(
+            title="Issue",
+            desc="Desc",
+            tag="bug",
+            priority="high",
+            project=self.project,
+            status="open",
+            author_user=self.member,
+            assignee_user=self.author,
+        )
+        self.comment = Comment.objects.create(
+            project=self.project,
+            description="Comment",
+            author_user=self.member,
+            issue=self.issue,
+        )
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        self.client.force_authenticate(user=user)
+
+
+def count_table_queries(context, table):
+    return sum(table in query["sql"] for query in context.captured_queries)
+
+
+class PermissionCacheTests(CrudTestCase):
+    def comment_url(self):
+        return reverse(
+            "comment-detail",
+            kwargs={
+                "project_id": self.project.id,
+                "issue_id": self.issue.id,
+                "comment_id": self.comment.id,
+            },
+        )
+
+    def test_comment_detail_resolves_permission_once(self):
+        self.authenticate(self.member)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.comment_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(count_table_queries(context, "crud_projectaccess"), 1)
+        self.assertEqual(count_table_queries(context, 'FROM "auth_user"'), 0)
+
+    def test_comment_update_resolves_permission_once(self):
+        self.authenticate(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(self.comment_url(), {"description": "Edited"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(count_table_queries(context, "crud_projectaccess"), 1)
+
+    def test_comment_delete_resolves_permission_once(self):
+        self.authenticate(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(self.comment_url())
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(count_table_queries(context, "crud_projectaccess"), 1)
+
+    def test_outsider_is_denied(self):
+        self.authenticate(self.outsider)
+        response = self.client.get(self.comment_url())
+        self.assertEqual(response.status_code, 403)
+
+
+class MembershipCacheTests(CrudTestCase):
+    def project_url(self):
+        return reverse("project-detail", kwargs={"project_id": self.project.id})
+
+    def test_permission_is_reused_across_requests(self):
+        self.authenticate(self.member)
+        self.client.get(self.project_url())
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.project_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            count_table_queries(context, '"crud_projectaccess"."permission"'), 0
+        )
+        self.assertEqual(membership_cache.stats()["hits"], 1)
+        self.assertEqual(membership_cache.stats()["misses"], 1)
+
+    def test_contributor_changes_invalidate_entry(self):
+        self.authenticate(self.member)
+        self.assertEqual(self.client.delete(self.project_url()).status_code, 403)
+
+        Contributor.objects.filter(user=self.member).get().delete()
+        Contributor.objects.create(
+            user=self.member, project=self.project, permission="admin", role="dev"
+        )
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "admin"
+        )
+
+        Contributor.objects.get(user=self.member).delete()
+        self.assertIsNone(
+            membership_cache.get_permission(self.member.id, self.project.id)
+        )
+
+    def test_entries_loaded_before_the_commit_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Contributor.objects.get(user=self.member).delete()
+            # A concurrent reader still sees the row until the commit
+            membership_cache._set_local(self.member.id, self.project.id, "user")
+        self.assertIsNone(
+            membership_cache.get_permission(self.member.id, self.project.id)
+        )
+
+    def test_project_changes_invalidate_entries(self):
+        membership_cache.get_permission(self.member.id, self.project.id)
+        self.project.save()
+        self.assertEqual(membership_cache.stats()["size"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = MembershipCache(size=1, ttl=60)
+        cache.get_permission(self.member.id, self.project.id)
+        cache.get_permission(self.author.id, self.project.id)
+        cache.get_permission(self.author.id, self.project.id)
+        self.assertEqual(
+            cache.stats(),
+            {
+                "hits": 1,
+                "misses": 2,
+                "evictions": 1,
+                "backend_hits": 0,
+                "size": 1,
+                "max_size": 1,
+                "ttl": 60,
+            },
+        )
+
+    def test_shared_backend_is_invalidated_per_project(self):
+        backend = caches["default"]
+        backend.clear()
+        first = MembershipCache(size=10, ttl=60, backend=backend)
+        second = MembershipCache(size=10, ttl=60, backend=backend)
+
+        first.get_permission(self.member.id, self.project.id)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(
+                second.get_permission(self.member.id, self.project.id), "user"
+            )
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(second.stats()["backend_hits"], 1)
+
+        first.invalidate(self.project.id)
+        with CaptureQueriesContext(connection) as context:
+            second.get_permission(self.member.id, self.project.id)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_shared_backend_revokes_entries_of_other_processes(self):
+        backend = caches["default"]
+        first = MembershipCache(size=10, ttl=60, backend=backend)
+        second = MembershipCache(size=10, ttl=60, backend=backend)
+        self.assertEqual(second.get_permission(self.member.id, self.project.id), "user")
+        self.assertEqual(second.get_permission(self.member.id, self.project.id), "user")
+        self.assertEqual(second.stats()["hits"], 1)
+
+        # Revoked by another process, whose invalidation second never sees
+        ProjectAccess.objects.filter(user=self.member).delete()
+        first.invalidate(self.project.id, self.member.id)
+        self.assertIsNone(second.get_permission(self.member.id, self.project.id))
+
+
+class ProjectListTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.own_project = Project.objects.create(
+            title="Own", description="Mine", type="front-end", author_user=self.member
+        )
+        Project.objects.create(
+            title="Hidden", description="Other", type="ios", author_user=self.outsider
+        )
+        self.authenticate(self.member)
+
+    def test_lists_authored_and_contributed_projects_once(self):
+        response = self.client.get(reverse("project-list-create"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [project["id"] for project in response.data["results"]],
+            [self.project.id, self.own_project.id],
+        )
+
+    def test_supports_search_ordering_and_pagination(self):
+        url = reverse("project-list-create")
+        response = self.client.get(url, {"search": "own"})
+        self.assertEqual(
+            [project["id"] for project in response.data["results"]],
+            [self.own_project.id],
+        )
+
+        response = self.client.get(url, {"ordering": "-id", "limit": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["results"][0]["id"], self.own_project.id)
+
+
+class ProjectAccessTests(CrudTestCase):
+    def access(self, project):
+        return dict(
+            ProjectAccess.objects.filter(project=project).values_list(
+                "user_id", "permission"
+            )
+        )
+
+    def test_merges_authorship_and_contributions(self):
+        self.assertEqual(
+            self.access(self.project), {self.author.id: "admin", self.member.id: "user"}
+        )
+        Contributor.objects.filter(user=self.author).update(permission="user")
+        Contributor.objects.get(user=self.author).save()
+        Contributor.objects.get(user=self.member).delete()
+        self.assertEqual(self.access(self.project), {self.author.id: "admin"})
+
+        project = Project.objects.get(id=self.project.id)
+        project.author_user = self.outsider
+        project.save()
+        self.assertEqual(
+            self.access(self.project),
+            {self.author.id: "user", self.outsider.id: "admin"},
+        )
+
+        self.project.delete()
+        self.assertFalse(ProjectAccess.objects.exists())
+
+    def test_author_without_contributor_row_manages_the_project(self):
+        project = Project.objects.create(
+            title="Own", description="Mine", type="ios", author_user=self.outsider
+        )
+        issue = Issue.objects.create(
+            title="Issue",
+            desc="Desc",
+            tag="bug",
+            priority="low",
+            project=project,
+            status="open",
+            author_user=self.member,
+            assignee_user=self.member,
+        )
+        self.authenticate(self.outsider)
+        url = reverse(
+            "issue-detail", kwargs={"project_id": project.id, "issue_id": issue.id}
+        )
+        response = self.client.put(url, {"status": "closed"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_issue_updates_follow_the_project_permission(self):
+        url = reverse(
+            "issue-detail",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        self.authenticate(self.author)
+        self.assertEqual(self.client.put(url, {"status": "closed"}).status_code, 200)
+        self.authenticate(self.outsider)
+        self.assertEqual(self.client.put(url, {"status": "open"}).status_code, 403)
+
+    def test_checks_many_projects_in_one_query(self):
+        projects = [
+            Project.objects.create(
+                title=f"Project {index}",
+                description="Desc",
+                type="ios",
+                author_user=self.outsider,
+            )
+            for index in range(3)
+        ]
+        Contributor.objects.create(
+            user=self.member, project=projects[0], permission="admin", role="dev"
+        )
+        ids = [self.project.id] + [project.id for project in projects]
+        with self.assertNumQueries(1):
+            permissions = ProjectAccess.objects.permissions(self.member.id, ids)
+        self.assertEqual(
+            permissions, {self.project.id: "user", projects[0].id: "admin"}
+        )
+
+    def test_moving_a_contributor_revokes_the_former_user(self):
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "user"
+        )
+        self.authenticate(self.author)
+        url = reverse(
+            "collaborator-detail",
+            kwargs={"project_id": self.project.id, "user_id": self.member.id},
+        )
+        response = self.client.put(url, {"user": self.outsider.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.access(self.project),
+            {self.author.id: "admin", self.outsider.id: "user"},
+        )
+        self.assertIsNone(
+            membership_cache.get_permission(self.member.id, self.project.id)
+        )
+        self.authenticate(self.member)
+        project_url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        self.assertEqual(self.client.get(project_url).status_code, 403)
+
+    def test_new_contributors_overwrite_stale_rows(self):
+        ProjectAccess.objects.create(
+            user=self.outsider, project=self.project, permission="admin"
+        )
+        Contributor.objects.create(
+            user=self.outsider, project=self.project, permission="user", role="dev"
+        )
+        self.assertEqual(self.access(self.project)[self.outsider.id], "user")
+
+    def test_rebuild_repairs_drift(self):
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "user"
+        )
+        ProjectAccess.objects.filter(user=self.author).delete()
+        ProjectAccess.objects.filter(user=self.member).update(permission="admin")
+        ProjectAccess.objects.create(
+            user=self.outsider, project=self.project, permission="user"
+        )
+        out = StringIO()
+        call_command("rebuild_access", stdout=out)
+        self.assertIn("Repaired 3 access row(s).", out.getvalue())
+        self.assertEqual(
+            self.access(self.project), {self.author.id: "admin", self.member.id: "user"}
+        )
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "user"
+        )
+
+
+class KeysetPaginationTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(24):
+            Issue.objects.create(
+                title=f"Issue {index}",
+                desc="Desc",
+                tag="task",
+                priority="low",
+                project=self.project,
+                status="open",
+                author_user=self.member,
+                assignee_user=self.member,
+            )
+        self.url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        self.authenticate(self.member)
+
+    def test_pages_forward_and_backward(self):
+        expected = list(
+            Issue.objects.order_by("created_time", "id").values_list("id", flat=True)
+        )
+
+        response = self.client.get(self.url)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        seen = [issue["id"] for issue in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [issue["id"] for issue in response.data["results"]]
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [issue["id"] for issue in response.data["results"]], expected[10:20]
+        )
+
+    def test_count_is_optional(self):
+        response = self.client.get(self.url, {"count": "true", "limit": 5})
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_deep_pages_do_not_use_offset(self):
+        response = self.client.get(self.url, {"limit": 20})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(response.data["next"])
+        self.assertFalse(
+            any("OFFSET" in query["sql"] for query in context.captured_queries)
+        )
+        self.assertEqual(count_table_queries(context, "COUNT(*)"), 0)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "nope"})
+        self.assertEqual(response.status_code, 404)
+
+
+class IssueFilterTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mine = Issue.objects.create(
+            title="Mine",
+            desc="Desc",
+            tag="bug",
+            priority="high",
+            project=self.project,
+            status="open",
+            author_user=self.author,
+            assignee_user=self.member,
+        )
+        Issue.objects.create(
+            title="Closed",
+            desc="Desc",
+            tag="bug",
+            priority="high",
+            project=self.project,
+            status="closed",
+            author_user=self.author,
+            assignee_user=self.member,
+        )
+        self.url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        self.authenticate(self.member)
+
+    def filter(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [issue["id"] for issue in response.data["results"]]
+
+    def test_combines_filters(self):
+        self.assertEqual(
+            self.filter(
+                status="open", priority="high", tag="bug", assignee_user=self.member.id
+            ),
+            [self.mine.id],
+        )
+        self.assertEqual(
+            self.filter(status="open", author_user=self.member.id), [self.issue.id]
+        )
+        self.assertEqual(len(self.filter(status=["open", "closed"])), 3)
+
+    def test_filters_on_a_created_time_range(self):
+        Issue.objects.filter(id=self.issue.id).update(created_time="2020-01-01T00:00Z")
+        self.assertEqual(
+            self.filter(created_time_before="2021-01-01T00:00:00Z"), [self.issue.id]
+        )
+        self.assertNotIn(
+            self.issue.id, self.filter(created_time_after="2021-01-01T00:00:00Z")
+        )
+
+    def test_rejects_invalid_values(self):
+        response = self.client.get(self.url, {"status": "urgent"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+
+    def test_common_combinations_use_an_index(self):
+        queryset = Issue.objects.filter(
+            project=self.project, status="open", priority="high"
+        ).order_by("created_time", "id")
+        plan = queryset.explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("issue_project_status_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+class QueryShapingTests(CrudTestCase):
+    def create_issues(self, count):
+        for index in range(count):
+            user = User.objects.create_user(f"user{Issue.objects.count()}")
+            issue = Issue.objects.create(
+                title=f"Issue {index}",
+                desc="Desc",
+                tag="task",
+                priority="low",
+                project=self.project,
+                status="open",
+                author_user=user,
+                assignee_user=user,
+            )
+            Comment.objects.create(
+                project=self.project,
+                description="Comment",
+                author_user=user,
+                issue=issue,
+            )
+
+    def count_list_queries(self, url, limit):
+        # Warm the membership cache so only the listing itself is measured
+        self.client.get(url, {"limit": 1})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"limit": limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), limit)
+        return len(context.captured_queries)
+
+    def test_issue_list_query_count_is_constant(self):
+        self.create_issues(20)
+        self.authenticate(self.member)
+        url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        self.assertEqual(
+            self.count_list_queries(url, 2), self.count_list_queries(url, 20)
+        )
+        results = self.client.get(url, {"limit": 1}).json()["results"]
+        self.assertEqual(results[0]["author_username"], "member")
+        self.assertEqual(results[0]["assignee_username"], "author")
+
+    def test_project_list_query_count_is_constant(self):
+        for index in range(10):
+            project = Project.objects.create(
+                title=f"Project {index}",
+                description="Desc",
+                type="back-end",
+                author_user=self.member,
+            )
+            Contributor.objects.create(
+                user=self.author, project=project, permission="user", role="dev"
+            )
+        self.authenticate(self.member)
+        url = reverse("project-list-create")
+        self.assertEqual(
+            self.count_list_queries(url, 2), self.count_list_queries(url, 10)
+        )
+
+
+class ValuesRepresentationTests(CrudTestCase):
+    def assertSameJSON(self, serializer_class, queryset):
+        instances = serializer_class.shape_queryset(queryset)
+        rows = serializer_class.values_queryset(queryset)
+        self.assertIsInstance(list(rows)[0], dict)
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(serializer_class(list(rows), many=True).data),
+            renderer.render(serializer_class(list(instances), many=True).data),
+        )
+
+    def test_renders_the_same_json_as_the_serializer(self):
+        Contributor.objects.create(
+            user=self.outsider, project=self.project, permission="user", role="qa"
+        )
+        self.assertSameJSON(ProjectSerializer, Project.objects.order_by("id"))
+        self.assertSameJSON(IssueSerializer, Issue.objects.order_by("id"))
+        self.assertSameJSON(CommentSerializer, Comment.objects.order_by("id"))
+        self.assertSameJSON(ContributorSerializer, Contributor.objects.order_by("id"))
+        with timezone.override("Europe/Paris"):
+            self.assertSameJSON(IssueSerializer, Issue.objects.order_by("id"))
+
+    def test_list_endpoints_render_values_rows(self):
+        self.authenticate(self.member)
+        url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        with mock.patch.object(
+            IssueSerializer, "to_representation", side_effect=AssertionError
+        ):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["id"], self.issue.id)
+
+    def test_serializers_reading_objects_have_no_values_representation(self):
+        class IssueTitleSerializer(QueryShapingMixin, serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Issue
+                fields = ("id", "label")
+
+            def get_label(self, issue):
+                return issue.title
+
+        self.assertIsNone(IssueTitleSerializer.values_representation())
+        queryset = Issue.objects.all()
+        self.assertIs(IssueTitleSerializer.values_queryset(queryset), queryset)
+
+
+class FastJSONTests(TestCase):
+    data = {
+        "text": 'Crème brûlée \u2028 \u2029 "quoted"',
+        "when": datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "day": date(2023, 5, 1),
+        "amount": Decimal("12.50"),
+        "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+        "lazy": gettext_lazy("Issue"),
+        "nested": [{1: None, "flag": True}, 1.5],
+    }
+
+    def test_renders_the_same_bytes_as_drf(self):
+        self.assertEqual(
+            FastJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+        )
+        self.assertNotIn("\u2028".encode(), FastJSONRenderer().render(self.data))
+
+    def test_falls_back_to_drf(self):
+        renderer = FastJSONRenderer()
+        indented = renderer.render(
+            self.data, accepted_media_type="application/json; indent=2"
+        )
+        self.assertIn(b'\n  "text"', indented)
+        self.assertEqual(
+            renderer.render({"big": 2**70}), b'{"big":1180591620717411303424}'
+        )
+        with mock.patch("crud.renderers.orjson", None):
+            self.assertEqual(
+                renderer.render(self.data), JSONRenderer().render(self.data)
+            )
+        with self.assertRaises(TypeError):
+            renderer.render({"object": object()})
+
+    def test_parses_json(self):
+        parser = FastJSONParser()
+        self.assertEqual(
+            parser.parse(BytesIO('{"title": "Écran", "ids": [1, 2]}'.encode())),
+            {"title": "Écran", "ids": [1, 2]},
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"title": NaN}'))
+        self.assertEqual(
+            parser.parse(
+                BytesIO('{"title": "Écran"}'.encode("latin-1")),
+                parser_context={"encoding": "latin-1"},
+            ),
+            {"title": "Écran"},
+        )
+
+
+class CommentListTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_issue = Issue.objects.create(
+            title="Other",
+            desc="Desc",
+            tag="bug",
+            priority="low",
+            project=self.project,
+            status="open",
+            author_user=self.member,
+            assignee_user=self.member,
+        )
+        self.other_comment = Comment.objects.create(
+            project=self.project,
+            description="Elsewhere",
+            author_user=self.author,
+            issue=self.other_issue,
+        )
+        self.authenticate(self.member)
+
+    def test_lists_only_the_issue_thread(self):
+        url = reverse(
+            "comment-list-create",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        response = self.client.get(url)
+        self.assertEqual(
+            [comment["id"] for comment in response.data["results"]],
+            [self.comment.id],
+        )
+
+    def test_project_feed_lists_every_thread(self):
+        url = reverse("project-comment-list", kwargs={"project_id": self.project.id})
+        response = self.client.get(url)
+        self.assertEqual(
+            [comment["id"] for comment in response.data["results"]],
+            [self.comment.id, self.other_comment.id],
+        )
+
+    def test_outsiders_are_denied(self):
+        self.authenticate(self.outsider)
+        thread_url = reverse(
+            "comment-list-create",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        self.assertEqual(self.client.get(thread_url).status_code, 403)
+        response = self.client.post(thread_url, {"description": "Intruding"})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Comment.objects.filter(description="Intruding").exists())
+
+        feed_url = reverse(
+            "project-comment-list", kwargs={"project_id": self.project.id}
+        )
+        self.assertEqual(self.client.get(feed_url).status_code, 403)
+
+
+class SearchTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_project = Project.objects.create(
+            title="Other",
+            description="Desc",
+            type="back-end",
+            author_user=self.author,
+        )
+        self.crash = self.create_issue("Crash au démarrage", "Le serveur plante")
+        self.login = self.create_issue("Connexion", "Crash du serveur à la connexion")
+        self.create_issue("Crash", "Ailleurs", project=self.other_project)
+        self.url = reverse("project-search", kwargs={"project_id": self.project.id})
+        self.authenticate(self.member)
+
+    def create_issue(self, title, desc, project=None):
+        return Issue.objects.create(
+            title=title,
+            desc=desc,
+            tag="bug",
+            priority="high",
+            project=project or self.project,
+            status="open",
+            author_user=self.member,
+            assignee_user=self.author,
+        )
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_ranks_title_matches_first_within_the_project(self):
+        self.assertEqual(self.search(q="crash"), [self.crash.id, self.login.id])
+        # Accents are ignored and every word must match
+        self.assertEqual(self.search(q="DEMARRAGE crash"), [self.crash.id])
+        self.assertEqual(self.search(q="crash", limit=1, offset=1), [self.login.id])
+
+    def test_follows_writes(self):
+        self.login.title = "Crash à la connexion"
+        self.login.save()
+        self.crash.delete()
+        self.assertEqual(self.search(q="crash"), [self.login.id])
+        self.assertEqual(self.search(q="plante"), [])
+
+    def test_searches_comments(self):
+        self.assertEqual(self.search(q="comment", type="comments"), [self.comment.id])
+
+    def test_rejects_invalid_queries(self):
+        # FTS5 syntax is not interpreted
+        self.assertEqual(self.search(q='"crash*'), [self.crash.id, self.login.id])
+        self.assertEqual(self.client.get(self.url, {"q": "!!"}).status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url, {"q": "crash", "type": "users"}).status_code,
+            400,
+        )
+
+        self.authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url, {"q": "crash"}).status_code, 403)
+
+
+class ExportTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("project-export", kwargs={"project_id": self.project.id})
+        self.authenticate(self.member)
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_streams_ndjson(self):
+        response, content = self.export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(row["record"], row["id"]) for row in rows],
+            [
+                ("project", self.project.id),
+                ("issue", self.issue.id),
+                ("comment", self.comment.id),
+            ],
+        )
+        self.assertEqual(rows[1]["author_username"], "member")
+        self.assertEqual(rows[1]["comment_count"], 1)
+        self.assertEqual(rows[2]["issue"], self.issue.id)
+        # Same representation as the API
+        detail = self.client.get(
+            reverse(
+                "issue-detail",
+                kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+            )
+        )
+        self.assertEqual(rows[1]["created_time"], detail.data["created_time"])
+
+    def test_streams_csv(self):
+        response, content = self.export(output="csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(
+            [row["record"] for row in rows], ["project", "issue", "comment"]
+        )
+        self.assertEqual(rows[2]["description"], "Comment")
+        self.assertEqual(rows[2]["title"], "")
+
+    def test_reads_each_table_once(self):
+        with CaptureQueriesContext(connection) as context:
+            self.export()
+        self.assertEqual(count_table_queries(context, 'FROM "crud_issue"'), 1)
+        self.assertEqual(count_table_queries(context, 'FROM "crud_comment"'), 1)
+
+    def test_is_restricted_to_contributors(self):
+        self.assertEqual(self.client.get(self.url, {"output": "xml"}).status_code, 400)
+        self.authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class IssueBulkTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("issue-bulk", kwargs={"project_id": self.project.id})
+
+    def issue_data(self, title, **overrides):
+        return {
+            "title": title,
+            "desc": "Desc",
+            "tag": "task",
+            "priority": "low",
+            "status": "open",
+            "assignee_user": self.member.id,
+            **overrides,
+        }
+
+    def test_creates_a_batch_with_constant_queries(self):
+        self.authenticate(self.member)
+        self.client.post(self.url, [self.issue_data("Warm up")])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                self.url, [self.issue_data(f"Bulk {index}") for index in range(20)]
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(response.data[0]["author_user"], self.member.id)
+        self.assertEqual(response.data[0]["author_username"], "member")
+        # Including the single update of the project counters
+        self.assertLessEqual(len(context.captured_queries), 9)
+        self.assertEqual(Issue.objects.filter(title__startswith="Bulk").count(), 20)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.issue_count, 22)
+        self.assertEqual(self.project.open_issue_count, 22)
+
+    def test_invalid_items_reject_the_whole_batch(self):
+        self.authenticate(self.member)
+        response = self.client.post(
+            self.url,
+            [
+                self.issue_data("Valid"),
+                self.issue_data("Invalid", priority="urgent", assignee_user=9999),
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(set(response.data[1]), {"priority", "assignee_user"})
+        self.assertFalse(Issue.objects.filter(title="Valid").exists())
+
+    def test_rejects_oversized_batches(self):
+        self.authenticate(self.member)
+        response = self.client.post(self.url, [self.issue_data("Issue")] * 501)
+        self.assertEqual(response.status_code, 400)
+
+    def test_updates_a_batch(self):
+        own_issue = Issue.objects.create(
+            project=self.project,
+            author_user=self.author,
+            assignee_user=self.author,
+            **{
+                key: value
+                for key, value in self.issue_data("Own").items()
+                if key != "assignee_user"
+            },
+        )
+        self.authenticate(self.author)
+        response = self.client.patch(
+            self.url,
+            [
+                {"id": own_issue.id, "status": "closed"},
+                {"id": self.issue.id, "status": "closed"},
+                {"id": 9999, "status": "closed"},
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        # Admins may edit the issues of other authors, as in the detail view
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(response.data[1], {})
+        self.assertIn("id", response.data[2])
+
+        response = self.client.patch(self.url, [{"id": True, "status": "closed"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("id", response.data[0])
+
+        response = self.client.patch(
+            self.url, [{"id": own_issue.id, "status": "closed", "project": 9999}]
+        )
+        self.assertEqual(response.status_code, 200)
+        own_issue.refresh_from_db()
+        self.assertEqual(own_issue.status, "closed")
+        self.assertEqual(own_issue.project_id, self.project.id)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.open_issue_count, 1)
+
+    def test_deletes_a_batch(self):
+        self.authenticate(self.member)
+        response = self.client.delete(self.url, {"ids": [self.issue.id]})
+        self.assertEqual(response.status_code, 403)
+
+        self.authenticate(self.author)
+        response = self.client.delete(self.url, {"ids": [self.issue.id, 9999]})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Issue.objects.filter(id=self.issue.id).exists())
+
+        response = self.client.delete(self.url, {"ids": [self.issue.id]})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Issue.objects.filter(id=self.issue.id).exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.issue_count, 0)
+
+    def test_deletes_a_batch_with_constant_queries(self):
+        issues = Issue.objects.bulk_create(
+            [
+                Issue(
+                    title=f"Bulk {index}",
+                    desc="Desc",
+                    tag="task",
+                    priority="low",
+                    project=self.project,
+                    status="open" if index % 2 else "closed",
+                    author_user=self.member,
+                    assignee_user=self.member,
+                )
+                for index in range(20)
+            ]
+        )
+        counters.count_issues(issues)
+
+        self.authenticate(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(
+                self.url, {"ids": [issue.id for issue in issues] + [self.issue.id]}
+            )
+        self.assertEqual(response.status_code, 204)
+        # Including the single update of the project counters
+        self.assertEqual(count_table_queries(context, 'UPDATE "crud_project"'), 1)
+        self.assertLessEqual(len(context.captured_queries), 12)
+        self.project.refresh_from_db()
+        self.assertEqual(
+            (self.project.issue_count, self.project.open_issue_count), (0, 0)
+        )
+
+
+class CounterTests(CrudTestCase):
+    def assertCounters(self, issues, open_issues, comments):
+        self.project.refresh_from_db()
+        self.issue.refresh_from_db()
+        self.assertEqual(
+            (
+                self.project.issue_count,
+                self.project.open_issue_count,
+                self.issue.comment_count,
+            ),
+            (issues, open_issues, comments),
+        )
+
+    def test_follow_creations_status_changes_and_deletions(self):
+        self.assertCounters(1, 1, 1)
+
+        self.authenticate(self.author)
+        url = reverse(
+            "issue-detail",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        response = self.client.patch(url, {"status": "closed"})
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(1, 0, 1)
+
+        # A save of a deferred instance loads the status it overwrites
+        issue = Issue.objects.only("id").get(id=self.issue.id)
+        issue.status = "open"
+        issue.save()
+        self.assertCounters(1, 1, 1)
+
+        Comment.objects.create(
+            project=self.project,
+            description="Second",
+            author_user=self.author,
+            issue=self.issue,
+        )
+        self.assertCounters(1, 1, 2)
+        self.comment.delete()
+        self.assertCounters(1, 1, 1)
+
+        self.issue.delete()
+        self.project.refresh_from_db()
+        self.assertEqual(
+            (self.project.issue_count, self.project.open_issue_count), (0, 0)
+        )
+
+    def test_full_saves_do_not_write_back_stale_counters(self):
+        stale = Issue.objects.get(id=self.issue.id)
+        Comment.objects.create(
+            project=self.project,
+            description="Second",
+            author_user=self.author,
+            issue=self.issue,
+        )
+        stale.title = "Renamed"
+        stale.save()
+        self.assertCounters(1, 1, 2)
+
+    def test_are_exposed_read_only(self):
+        self.authenticate(self.author)
+        url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        response = self.client.put(
+            url,
+            {
+                "title": "Project",
+                "description": "Desc",
+                "type": "back-end",
+                "issue_count": 42,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["issue_count"], 1)
+        self.assertEqual(response.data["open_issue_count"], 1)
+
+    def test_recount_repairs_drift(self):
+        Project.objects.update(issue_count=7, open_issue_count=0)
+        Issue.objects.update(comment_count=3)
+        out = StringIO()
+        call_command("recount", stdout=out)
+        self.assertIn("Repaired 1 project(s) and 1 issue(s).", out.getvalue())
+        self.assertCounters(1, 1, 1)
+
+        out = StringIO()
+        call_command("recount", stdout=out)
+        self.assertIn("Repaired 0 project(s) and 0 issue(s).", out.getvalue())
+
+
+REPLICAS = {"ALIASES": ["replica"], "PIN_SECONDS": 5, "BACKEND": "default"}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.status = 200
+
+        def get_response(request):
+            self.routed_to = ReplicaRouter().db_for_read(Issue)
+            return HttpResponse(status=self.status)
+
+        self.middleware = ReplicaMiddleware(get_response)
+
+    def request(self, method, user=None):
+        headers = {}
+        if user is not None:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(user)}"
+        self.middleware(getattr(self.factory, method)("/projects/", **headers))
+        return self.routed_to
+
+    def test_reads_go_to_a_replica_until_the_user_writes(self):
+        # Outside of the transaction every test runs in
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.request("get", self.member), "replica")
+            self.assertEqual(self.request("get"), "replica")
+
+            self.status = 400
+            self.request("post", self.member)
+            self.assertEqual(self.request("get", self.member), "replica")
+
+            self.status = 201
+            self.assertEqual(self.request("post", self.member), "default")
+            self.assertEqual(self.request("get", self.member), "default")
+            self.assertEqual(self.request("get", self.author), "replica")
+
+    def test_reads_stay_on_the_primary_without_a_shared_cache(self):
+        with override_settings(DATABASE_REPLICAS={**REPLICAS, "BACKEND": None}):
+            with self.assertLogs("crud.routers", "WARNING"):
+                self.middleware = ReplicaMiddleware(self.middleware.get_response)
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.request("get", self.member), "default")
+
+    def test_transactions_read_from_the_primary(self):
+        self.assertEqual(self.request("get", self.member), "default")
+        with use_primary():
+            self.assertIsNone(read_alias.get())
+
+
+@skipUnless(
+    connection.settings_dict["OPTIONS"].get("transaction_mode"), "Tuned SQLite only"
+)
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        options = connection.settings_dict["OPTIONS"]
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        with connection.cursor() as cursor:
+            # 1 is NORMAL and 2 is MEMORY
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_a_consistent_dataset(self):
+        out = StringIO()
+        call_command(
+            "generate_data",
+            users=30,
+            projects=5,
+            issues=60,
+            comments=200,
+            batch_size=50,
+            stdout=out,
+        )
+        self.assertIn("200 comment(s)", out.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 200)
+        # Authors administer their projects, and counters match the rows
+        for project in Project.objects.all():
+            self.assertTrue(
+                Contributor.objects.filter(
+                    project=project, user=project.author_user, permission="admin"
+                ).exists()
+            )
+        self.assertEqual(sum(Project.objects.values_list("issue_count", flat=True)), 60)
+        self.assertEqual(
+            sum(Issue.objects.values_list("comment_count", flat=True)), 200
+        )
+        self.assertFalse(
+            Comment.objects.exclude(project_id=F("issue__project_id")).exists()
+        )
+
+
+class ContributorBulkTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("collaborator-bulk", kwargs={"project_id": self.project.id})
+        self.authenticate(self.author)
+
+    def test_upserts_rows_and_reports_their_status(self):
+        newcomers = [User.objects.create_user(f"new{index}") for index in range(5)]
+        rows = [
+            {"user": self.member.id, "permission": "admin", "role": "dev"},
+            {"user": self.author.id, "permission": "admin", "role": "owner"},
+        ] + [
+            {"user": user.id, "permission": "user", "role": "dev"} for user in newcomers
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), 11)
+        self.assertEqual(
+            [row["status"] for row in response.data],
+            ["updated", "unchanged"] + ["created"] * 5,
+        )
+        self.assertEqual(self.project.contributor_set.count(), 7)
+        self.assertEqual(Contributor.objects.get(user=self.member).permission, "admin")
+
+    def test_updated_rows_invalidate_the_membership_cache(self):
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "user"
+        )
+        self.client.post(
+            self.url, [{"user": self.member.id, "permission": "admin", "role": "dev"}]
+        )
+        self.assertEqual(
+            membership_cache.get_permission(self.member.id, self.project.id), "admin"
+        )
+
+    def test_requires_the_admin_permission(self):
+        self.authenticate(self.member)
+        response = self.client.post(
+            self.url, [{"user": self.member.id, "permission": "admin", "role": "dev"}]
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            ProjectAccess.objects.get(
+                user=self.member, project=self.project
+            ).permission,
+            "user",
+        )
+
+    def test_reports_row_errors(self):
+        response = self.client.post(
+            self.url,
+            [
+                {"user": self.outsider.id, "permission": "user", "role": "dev"},
+                {"user": 9999, "permission": "owner", "role": "dev"},
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(set(response.data[1]), {"user", "permission"})
+
+        response = self.client.post(
+            self.url,
+            [{"user": self.outsider.id, "permission": "user", "role": "dev"}] * 2,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("user", response.data[1])
+        self.assertFalse(Contributor.objects.filter(user=self.outsider).exists())
+
+    def test_single_create_looks_up_the_target_user(self):
+        url = reverse("collaborator-list", kwargs={"project_id": self.project.id})
+        response = self.client.post(
+            url, {"user": self.outsider.id, "permission": "user", "role": "dev"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(
+            url, {"user": self.outsider.id, "permission": "admin", "role": "dev"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Contributor.objects.get(user=self.outsider).permission, "admin"
+        )
+
+    def test_single_upsert_requires_the_admin_permission(self):
+        url = reverse("collaborator-list", kwargs={"project_id": self.project.id})
+        self.authenticate(self.member)
+        response = self.client.post(
+            url, {"user": self.member.id, "permission": "admin", "role": "dev"}
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            url, {"user": self.outsider.id, "permission": "user", "role": "dev"}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Contributor.objects.get(user=self.member).permission, "user")
+        self.assertFalse(Contributor.objects.filter(user=self.outsider).exists())
+
+    def test_single_update_validates_the_permission(self):
+        url = reverse("collaborator-list", kwargs={"project_id": self.project.id})
+        response = self.client.post(
+            url, {"user": self.member.id, "permission": "owner", "role": "dev"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("permission", response.data)
+        self.assertEqual(Contributor.objects.get(user=self.member).permission, "user")
+
+
+class ConditionalGetTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.member)
+
+    def test_detail_returns_not_modified_before_serializing(self):
+        url = reverse(
+            "issue-detail",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        self.issue.status = "closed"
+        self.issue.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_honours_if_modified_since(self):
+        url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_etag_follows_the_contributors(self):
+        url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        etag = self.client.get(url)["ETag"]
+
+        contributor = Contributor.objects.create(
+            user=self.outsider, project=self.project, permission="user", role="dev"
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.outsider.id, response.data["contributors"])
+
+        etag = response["ETag"]
+        contributor.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.outsider.id, response.data["contributors"])
+
+        etag = response["ETag"]
+        self.authenticate(self.author)
+        self.client.post(
+            reverse("collaborator-bulk", kwargs={"project_id": self.project.id}),
+            [{"user": self.outsider.id, "permission": "user", "role": "dev"}],
+        )
+        self.authenticate(self.member)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_follows_the_collection(self):
+        url = reverse(
+            "comment-list-create",
+            kwargs={"project_id": self.project.id, "issue_id": self.issue.id},
+        )
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(count_table_queries(context, 'FROM "crud_comment"'), 1)
+
+        self.client.post(url, {"description": "Another"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+class ResponseCacheTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        # Disabled by default, without a cache shared by the workers
+        patcher = mock.patch.object(response_cache, "backend", caches["default"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.authenticate(self.member)
+        self.url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+
+    def test_second_get_is_served_from_the_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        # Only the permission, which the membership cache already holds
+        self.assertEqual(len(context.captured_queries), 0)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_query_parameters_are_cached_apart(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, {"status": "closed"})
+        self.assertEqual(json.loads(response.content)["results"], [])
+
+    def test_writes_invalidate_the_project(self):
+        data = {
+            "title": "New",
+            "desc": "Desc",
+            "tag": "bug",
+            "priority": "low",
+            "status": "open",
+            "assignee_user": self.author.id,
+        }
+        self.client.get(self.url)
+        self.client.post(self.url, data)
+        response = self.client.get(self.url)
+        self.assertEqual(len(json.loads(response.content)["results"]), 2)
+
+        # Bulk writes send no signal
+        bulk_url = reverse("issue-bulk", kwargs={"project_id": self.project.id})
+        self.client.post(bulk_url, [{**data, "title": "Bulk"}], format="json")
+        response = self.client.get(self.url)
+        self.assertEqual(len(json.loads(response.content)["results"]), 3)
+
+    def test_counter_changes_invalidate_the_project_detail(self):
+        url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        self.assertEqual(self.client.get(url).data["issue_count"], 1)
+        hits = response_cache.stats()["hits"]
+        self.issue.delete()
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)["issue_count"], 0)
+        self.assertEqual(response_cache.stats()["hits"], hits)
+
+    def test_outsider_is_denied_a_cached_response(self):
+        self.client.get(self.url)
+        self.authenticate(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class MetricsTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.authenticate(self.member)
+
+    def metric(self, text, name, **labels):
+        pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        prefix = f"softdesk_{name}{{{pairs}}} "
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix) :])
+        return None
+
+    def test_records_requests_per_route(self):
+        url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        response = self.client.get(url)
+        self.client.get("/nowhere/")
+
+        text = self.client.get(reverse("metrics")).content.decode()
+        labels = {"route": "issue-list-create", "method": "GET"}
+        self.assertEqual(self.metric(text, "requests_total", **labels, status=200), 1)
+        self.assertEqual(
+            self.metric(text, "request_duration_seconds_count", **labels), 1
+        )
+        self.assertGreater(self.metric(text, "db_queries_sum", **labels), 0)
+        self.assertGreater(self.metric(text, "db_query_seconds_total", **labels), 0)
+        self.assertGreater(self.metric(text, "serialize_seconds_total", **labels), 0)
+        self.assertGreater(self.metric(text, "render_seconds_total", **labels), 0)
+        self.assertEqual(
+            self.metric(text, "response_size_bytes_sum", **labels),
+            len(response.content),
+        )
+        self.assertEqual(
+            self.metric(text, "response_size_bytes_bucket", **labels, le="+Inf"),
+            1,
+        )
+        self.assertEqual(
+            self.metric(
+                text, "requests_total", route="unmatched", method="GET", status=404
+            ),
+            1,
+        )
+        self.assertIsNotNone(self.metric(text, "cache_hits_total", cache="response"))
+        self.assertIsNotNone(
+            self.metric(text, "cache_evictions_total", cache="membership")
+        )
+        self.assertIn("# TYPE softdesk_cache_misses_total counter", text)
+
+    def test_times_nested_representations_once(self):
+        rows = list(IssueSerializer.values_queryset(Issue.objects.all()))
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        try:
+            # The list and the values representation it delegates to each
+            # measure their representation
+            with mock.patch("crud.metrics.time.perf_counter", side_effect=[1, 3]):
+                data = IssueSerializer(rows, many=True).data
+        finally:
+            current_request.reset(token)
+        self.assertEqual(data[0]["id"], self.issue.id)
+        self.assertEqual(request_metrics.serialize_seconds, 2)
+
+    async def test_counts_queries_of_async_views(self):
+        url = reverse("async-issue-list", kwargs={"project_id": self.project.id})
+        token = AccessToken.for_user(self.member)
+        await AsyncClient().get(url, headers={"Authorization": f"Bearer {token}"})
+        text = registry.export()
+        labels = {"route": "async-issue-list", "method": "GET"}
+        self.assertGreater(self.metric(text, "db_queries_sum", **labels), 0)
+
+    def test_token_protects_the_endpoint(self):
+        with override_settings(METRICS={"TOKEN": "secret"}):
+            response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_dumps_profiles_of_slow_requests(self):
+        url = reverse("project-detail", kwargs={"project_id": self.project.id})
+        with tempfile.TemporaryDirectory() as directory:
+            metrics = {
+                "PROFILE_SLOWER_THAN": 0,
+                "PROFILE_SAMPLE_RATE": 1,
+                "PROFILE_DIR": directory,
+            }
+            with override_settings(METRICS=metrics):
+                with self.assertLogs("crud.metrics", "WARNING"):
+                    APIClient().get(url)
+            (path,) = Path(directory).iterdir()
+            self.assertTrue(path.name.startswith("project-detail-GET-"))
+
+
+class AsyncViewTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.member)
+        self.async_client = AsyncClient()
+
+    def async_get(self, url, user, data=None):
+        return self.async_client.get(
+            url,
+            data,
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+        )
+
+    async def assert_same_response(self, name, async_name, data=None, **kwargs):
+        sync_response = await sync_to_async(self.client.get)(
+            reverse(name, kwargs=kwargs), data
+        )
+        async_response = await self.async_get(
+            reverse(async_name, kwargs=kwargs), self.member, data
+        )
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    async def test_matches_sync_views(self):
+        project_id, issue_id = self.project.id, self.issue.id
+        await self.assert_same_response("project-list-create", "async-project-list")
+        await self.assert_same_response(
+            "project-detail", "async-project-detail", project_id=project_id
+        )
+        await self.assert_same_response(
+            "issue-list-create", "async-issue-list", project_id=project_id
+        )
+        await sync_to_async(Issue.objects.create)(
+            title="Closed",
+            desc="Desc",
+            tag="task",
+            priority="low",
+            project_id=project_id,
+            status="closed",
+            author_user=self.member,
+            assignee_user=self.member,
+        )
+        await self.assert_same_response(
+            "issue-list-create",
+            "async-issue-list",
+            {"status": "open"},
+            project_id=project_id,
+        )
+        await self.assert_same_response(
+            "issue-detail",
+            "async-issue-detail",
+            project_id=project_id,
+            issue_id=issue_id,
+        )
+        await self.assert_same_response(
+            "comment-list-create",
+            "async-comment-list",
+            project_id=project_id,
+            issue_id=issue_id,
+        )
+        await self.assert_same_response(
+            "comment-detail",
+            "async-comment-detail",
+            project_id=project_id,
+            issue_id=issue_id,
+            comment_id=self.comment.id,
+        )
+
+    async def test_requires_authentication_and_permission(self):
+        url = reverse("async-project-detail", kwargs={"project_id": self.project.id})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_get(url, self.outsider)
+        self.assertEqual(response.status_code, 403)
+
+        response = await self.async_get(
+            reverse("async-project-detail", kwargs={"project_id": 9999}), self.member
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def create_foreign_comment(self):
+        project = Project.objects.create(
+            title="Other", description="Desc", type="ios", author_user=self.outsider
+        )
+        issue = Issue.objects.create(
+            title="Issue",
+            desc="Desc",
+            tag="bug",
+            priority="low",
+            project=project,
+            status="open",
+            author_user=self.outsider,
+            assignee_user=self.outsider,
+        )
+        return Comment.objects.create(
+            project=project,
+            description="Private",
+            author_user=self.outsider,
+            issue=issue,
+        )
+
+    async def test_comments_of_other_projects_are_not_found(self):
+        comment = await sync_to_async(self.create_foreign_comment)()
+        response = await self.async_get(
+            reverse(
+                "async-comment-detail",
+                kwargs={
+                    "project_id": self.project.id,
+                    "issue_id": comment.issue_id,
+                    "comment_id": comment.id,
+                },
+            ),
+            self.member,
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TokenAuthenticationTests(CrudTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.member)}"
+        )
+
+    def test_authenticates_without_loading_the_user(self):
+        url = reverse("issue-list-create", kwargs={"project_id": self.project.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(count_table_queries(context, 'FROM "auth_user"'), 0)
+
+    def test_creates_with_the_token_user(self):
+        url = reverse("project-list-create")
+        response = self.client.post(
+            url, {"title": "New", "description": "Desc", "type": "ios"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Project.objects.get(title="New").author_user, self.member)
+        self.assertEqual(self.client.get(url).data["count"], 2)
+
+    def test_loads_the_full_user_lazily(self):
+        self.member.email = "member@example.com"
+        self.member.save()
+        user = LazyTokenUser(AccessToken.for_user(self.member))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "member@example.com")
+            self.assertEqual(user.date_joined, self.member.date_joined)
+        self.assertEqual(user, self.member)
+
+        self.member.is_superuser = True
+        self.member.save()
+        user = LazyTokenUser(AccessToken.for_user(self.member))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, "member")
+            self.assertEqual(user.get_username(), "member")
+            self.assertTrue(user.is_superuser)
+            self.assertTrue(user.has_perm("crud.change_issue"))
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def login(self, username, password):
+        return self.client.post(
+            reverse("login"), {"username": username, "password": password}
+        )
+
+    def test_signup_and_login_use_the_preferred_hasher(self):
+        response = self.client.post(
+            reverse("signup"),
+            {
+                "username": "newcomer",
+                "email": "newcomer@example.com",
+                "password1": "a-long-passphrase",
+                "password2": "a-long-passphrase",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(username="newcomer")
+        self.assertEqual(identify_hasher(user.password).algorithm, "scrypt")
+        self.assertEqual(user.email, "newcomer@example.com")
+
+        self.assertEqual(self.login("newcomer", "a-long-passphrase").status_code, 200)
+        self.assertEqual(self.login("newcomer", "wrong").status_code, 401)
+        self.assertEqual(self.login("nobody", "wrong").status_code, 401)
+
+    @override_settings(
+        PASSWORD_HASHING={
+            **settings.PASSWORD_HASHING,
+            "PBKDF2_ITERATIONS": 1000,
+        }
+    )
+    def test_login_rehashes_outdated_hashes(self):
+        User.objects.create(
+            username="legacy",
+            password=make_password("passphrase", hasher="pbkdf2_sha256"),
+        )
+        self.assertEqual(self.login("legacy", "wrong").status_code, 401)
+        self.assertEqual(
+            identify_hasher(User.objects.get(username="legacy").password).algorithm,
+            "pbkdf2_sha256",
+        )
+
+        self.assertEqual(self.login("legacy", "passphrase").status_code, 200)
+        self.assertEqual(
+            identify_hasher(User.objects.get(username="legacy").password).algorithm,
+            "scrypt",
+        )
+        self.assertEqual(self.login("legacy", "passphrase").status_code, 200)
+
+    def test_pool_rejects_work_beyond_its_bounds(self):
+        pool = PasswordWorkerPool(workers=1, queue_size=0, timeout=5)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=pool.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        with self.assertRaises(PasswordPoolSaturated):
+            pool.run(lambda: None)
+        release.set()
+        thread.join()
+        self.assertIsNone(pool.run(lambda: None))
+
+
+class TokenRefreshTests(TestCase):
+    def test_refresh_rotates_the_refresh_token(self):
+        user = User.objects.create_user("member")
+        refresh = RefreshToken.for_user(user)
+        client = APIClient()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(reverse("token-refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data["refresh"], str(refresh))
+        if settings.JWT_BLACKLIST:
+            # The rotated token can't be replayed
+            replay = client.post(reverse("token-refresh"), {"refresh": str(refresh)})
+            self.assertEqual(replay.status_code, 401)
+        else:
+            self.assertEqual(len(context.captured_queries), 0)
+
+        rotated = RefreshToken(response.data["refresh"])
+        self.assertGreaterEqual(rotated["exp"], refresh["exp"])
+        self.assertEqual(rotated["user_id"], user.id)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(client.get(reverse("project-list-create")).status_code, 200)
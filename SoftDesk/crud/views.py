@@ -1,9 +1,16 @@
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import Contributor, Project, Issue, Comment, User
 from .serializers import (
     ContributorSerializer,
+    ContributorImportSerializer,
     ProjectSerializer,
     IssueSerializer,
     CommentSerializer,
@@ -15,12 +22,73 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from uuid import uuid4
-from .permissions import IsProjectContributor, IsAuthor
+from . import access, counters, export
+from .cache import membership_cache, response_cache
+from .conditional import (
+    CachedResponseMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+)
+from .filters import IssueFilter
+from .pagination import KeysetPagination, SearchPagination
+from .permissions import HasProjectAccess, check_project_admin
+from .search import TARGETS, SearchResults, search_terms
+
+logger = logging.getLogger(__name__)
 
 ####################
 # ViewSets         #
 ####################
 
+
+class ShapedQuerysetMixin:
+    """
+    Shape read querysets from the needs declared by the serializer class.
+
+    Pages of lists are read as ``values()`` rows when the serializer has a
+    values representation, which its list serializer uses to represent them.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = self.get_serializer_class().shape_queryset(queryset)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(
+            self.get_serializer_class().values_queryset(queryset)
+        )
+
+
+class BatchMixin:
+    """
+    Validate the shape and size of the list submitted to a batch endpoint.
+    """
+
+    max_batch_size = 500
+
+    def get_items(self, data, item_type=dict):
+        if not isinstance(data, list) or not data:
+            return None, Response(
+                {"error": "Expected a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(data) > self.max_batch_size:
+            return None, Response(
+                {"error": f"A batch holds at most {self.max_batch_size} items."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not all(
+            isinstance(item, item_type) and not isinstance(item, bool) for item in data
+        ):
+            return None, Response(
+                {"error": f"Every item must be of type {item_type.__name__}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return data, None
+
+
 """AUTHENTICATION"""
 
 
@@ -62,33 +130,32 @@ class CustomLoginView(APIView):
 """PROJECTS"""
 
 
-class ProjectRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ProjectRetrieveUpdateDestroyView(
+    CachedResponseMixin, ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     queryset = Project.objects.all()
+    cache_endpoint = "project-detail"
     serializer_class = ProjectSerializer
-    permission_classes = [permissions.IsAuthenticated, IsProjectContributor]
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
     lookup_url_kwarg = "project_id"
 
     def get_queryset(self):
         return Project.objects.filter(id=self.kwargs[self.lookup_url_kwarg])
 
 
-class ProjectListCreateView(generics.ListCreateAPIView):
+class ProjectListCreateView(
+    ConditionalListMixin, ShapedQuerysetMixin, generics.ListCreateAPIView
+):
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
-
-        # Get all projects for which the user is the author
-        author_projects = Project.objects.filter(author_user=user)
+    search_fields = ["title", "description", "type"]
+    ordering_fields = ["id", "title", "type"]
+    ordering = ["id"]
 
-        # Get all projects for which the user is a contributor
-        contributed_projects = Project.objects.filter(contributors=user)
-
-        # Combine the two sets of projects and remove duplicates
-        queryset = author_projects.union(contributed_projects)
-
-        return queryset
+    def get_queryset(self):
+        # Projects the user authored or contributes to, in a single query
+        return Project.objects.visible_to(self.request.user.id)
 
     def post(self, request, *args, **kwargs):
         user = request.user
@@ -106,9 +173,9 @@ class ProjectListCreateView(generics.ListCreateAPIView):
 """COLLABORATORS"""
 
 
-class ContributorListCreateView(generics.ListCreateAPIView):
+class ContributorListCreateView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = ContributorSerializer
-    permission_classes = [permissions.IsAuthenticated, IsProjectContributor]
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
 
     def get_queryset(self):
         project_id = self.kwargs["project_id"]
@@ -120,6 +187,7 @@ class ContributorListCreateView(generics.ListCreateAPIView):
         # Check if project exists
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(self.request, project)
+        check_project_admin(request, project.id)
 
         # Create a copy of the request data
         data = request.data.copy()
@@ -130,15 +198,18 @@ class ContributorListCreateView(generics.ListCreateAPIView):
         # Check if contributor already exists
         try:
             contributor = Contributor.objects.get(
-                user_id=request.user.id, project_id=project_id
+                user_id=data.get("user"), project_id=project_id
             )
 
-            # Update the contributor's permission if it has changed
-            if contributor.permission != data["permission"]:
-                contributor.permission = data["permission"]
-                contributor.save()
+            serializer = self.serializer_class(
+                contributor, data={"permission": data.get("permission")}, partial=True
+            )
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-                serializer = self.serializer_class(contributor)
+            # Update the contributor's permission if it has changed
+            if contributor.permission != serializer.validated_data["permission"]:
+                serializer.save()
                 return Response(serializer.data, status=status.HTTP_200_OK)
 
             # Return error response if contributor already exists with the same permission
@@ -149,7 +220,7 @@ class ContributorListCreateView(generics.ListCreateAPIView):
                 )
 
         # Create new contributor if it doesn't already exist
-        except Contributor.DoesNotExist:
+        except (Contributor.DoesNotExist, ValueError):
             serializer = self.serializer_class(data=data)
 
             if serializer.is_valid():
@@ -159,10 +230,84 @@ class ContributorListCreateView(generics.ListCreateAPIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ContributorBulkView(BatchMixin, APIView):
+    """
+    Add or update a batch of contributors of a project in one transaction.
+    Restricted to the admins of the project.
+
+    Takes a list of {"user", "permission", "role"} rows, upserts them against
+    the (user, project) unique constraint and returns the status of each row:
+    "created", "updated" or "unchanged".
+    """
+
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+
+    def post(self, request, project_id):
+        project = get_object_or_404(Project, id=project_id)
+        self.check_object_permissions(self.request, project)
+        check_project_admin(request, project.id)
+        items, error = self.get_items(request.data)
+        if error:
+            return error
+
+        serializer = ContributorImportSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = serializer.validated_data
+        occurrences = Counter(row["user"].id for row in rows)
+        if any(count > 1 for count in occurrences.values()):
+            return Response(
+                [
+                    {"user": ["This user appears more than once."]}
+                    if occurrences[row["user"].id] > 1
+                    else {}
+                    for row in rows
+                ],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        existing = {
+            contributor.user_id: contributor
+            for contributor in Contributor.objects.filter(
+                project_id=project.id, user_id__in=occurrences
+            )
+        }
+
+        results = []
+        for row in rows:
+            current = existing.get(row["user"].id)
+            if current is None:
+                row_status = "created"
+            elif (current.permission, current.role) != (row["permission"], row["role"]):
+                row_status = "updated"
+            else:
+                row_status = "unchanged"
+            results.append({"user": row["user"].id, "status": row_status})
+
+        with transaction.atomic():
+            Contributor.objects.bulk_create(
+                [Contributor(project_id=project.id, **row) for row in rows],
+                update_conflicts=True,
+                unique_fields=["user", "project"],
+                update_fields=["permission", "role"],
+            )
+            # bulk_create doesn't send the signals that keep access and the
+            # caches in sync
+            access.sync(project.id, list(occurrences), project.author_user_id)
+            if any(result["status"] != "unchanged" for result in results):
+                Project.objects.filter(id=project.id).touch()
+
+        for row in rows:
+            membership_cache.invalidate(project.id, row["user"].id)
+        response_cache.invalidate(project.id)
+        return Response(results)
+
+
 class ContributorRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Contributor.objects.all()
     serializer_class = ContributorSerializer
-    permission_classes = [permissions.IsAuthenticated, IsProjectContributor]
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
     lookup_url_kwarg = "user_id"
 
     def get_object(self):
@@ -188,9 +333,17 @@ class ContributorRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView
 """ISSUES"""
 
 
-class IssueListCreateView(generics.ListCreateAPIView):
+class IssueListCreateView(
+    CachedResponseMixin,
+    ConditionalListMixin,
+    ShapedQuerysetMixin,
+    generics.ListCreateAPIView,
+):
     serializer_class = IssueSerializer
-    permission_classes = [permissions.IsAuthenticated, IsProjectContributor]
+    cache_endpoint = "issue-list"
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+    pagination_class = KeysetPagination
+    filterset_class = IssueFilter
     lookup_url_kwarg_project = "project_id"
     lookup_url_kwarg_user = "user_id"
 
@@ -206,7 +359,7 @@ class IssueListCreateView(generics.ListCreateAPIView):
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(self.request, project)
         data = self.request.data.copy()
-        print(data)
+        logger.debug("New issue in project %s: %s", project_id, data)
         data[
             "author_user"
         ] = request.user.id  # set author_user to ID of authenticated user
@@ -221,11 +374,140 @@ class IssueListCreateView(generics.ListCreateAPIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class IssueRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class IssueBulkView(BatchMixin, APIView):
+    """
+    Create, update or delete a batch of issues of a project in one transaction.
+
+    POST takes a list of issues, PATCH a list of partial issues identified by
+    their "id", and DELETE an object holding the list of "ids" to remove. The
+    batch is written only when every item is valid; otherwise the response
+    lists the errors of each item, in the order they were submitted.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+
+    def get_project(self):
+        # Permissions are resolved once for the whole batch
+        project = get_object_or_404(Project, id=self.kwargs["project_id"])
+        self.check_object_permissions(self.request, project)
+        return project
+
+    def get_response_data(self, issues):
+        queryset = IssueSerializer.shape_queryset(
+            Issue.objects.filter(id__in=[issue.id for issue in issues])
+        )
+        issues_by_id = {issue.id: issue for issue in queryset}
+        return IssueSerializer(
+            [issues_by_id[issue.id] for issue in issues], many=True
+        ).data
+
+    def post(self, request, *args, **kwargs):
+        project = self.get_project()
+        items, error = self.get_items(request.data)
+        if error:
+            return error
+
+        data = [
+            {**item, "author_user": request.user.id, "project": project.id}
+            for item in items
+        ]
+        serializer = IssueSerializer(data=data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            issues = serializer.save()
+            # Bulk writes send no signal
+            counters.count_issues(issues)
+            response_cache.invalidate(project.id)
+        return Response(self.get_response_data(issues), status=status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        project = self.get_project()
+        items, error = self.get_items(request.data)
+        if error:
+            return error
+
+        # Booleans are ints, and True would match the issue 1
+        ids = [
+            pk if isinstance(pk, int) and not isinstance(pk, bool) else None
+            for pk in (item.get("id") for item in items)
+        ]
+        issues = Issue.objects.filter(
+            project_id=project.id, id__in=[pk for pk in ids if pk is not None]
+        ).in_bulk()
+
+        # Each issue is checked as the detail view checks it
+        access = HasProjectAccess()
+        errors = []
+        for pk in ids:
+            if pk not in issues:
+                errors.append({"id": ["Issue not found in this project."]})
+            elif not access.has_object_permission(request, self, issues[pk]):
+                errors.append({"id": ["You may not edit this issue."]})
+            else:
+                errors.append({})
+
+        # The project and author of an issue can't be changed in bulk
+        data = [
+            {
+                key: value
+                for key, value in item.items()
+                if key not in ("id", "project", "author_user")
+            }
+            for item in items
+        ]
+        instances = [issues.get(pk) for pk in ids]
+        serializer = IssueSerializer(instances, data=data, many=True, partial=True)
+        if serializer.is_valid():
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return Response(
+                [
+                    {**lookup_error, **item_error}
+                    for lookup_error, item_error in zip(errors, serializer.errors)
+                ],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            issues = serializer.save()
+            counters.count_issues(issues)
+            response_cache.invalidate(project.id)
+        return Response(self.get_response_data(issues))
+
+    def delete(self, request, *args, **kwargs):
+        project = self.get_project()
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        items, error = self.get_items(ids, item_type=int)
+        if error:
+            return error
+
+        found = set(
+            Issue.objects.filter(project_id=project.id, id__in=items).values_list(
+                "id", flat=True
+            )
+        )
+        errors = [
+            {} if pk in found else {"id": ["Issue not found in this project."]}
+            for pk in items
+        ]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            counters.delete_issues(Issue.objects.filter(id__in=found))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class IssueRetrieveUpdateDestroyView(
+    ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = IssueSerializer
     permission_classes = [
         permissions.IsAuthenticated,
-        IsProjectContributor,
+        HasProjectAccess,
     ]
     lookup_url_kwarg = "issue_id"
 
@@ -234,16 +516,16 @@ class IssueRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(self.request, project)
         issue_id = self.kwargs[self.lookup_url_kwarg]
-        issue = get_object_or_404(Issue, project_id=project_id, id=issue_id)
+        issue = get_object_or_404(
+            Issue.objects.select_related("author_user", "assignee_user"),
+            project_id=project_id,
+            id=issue_id,
+        )
+        self.check_object_permissions(self.request, issue)
         return issue
 
     def put(self, request, *args, **kwargs):
         instance = self.get_object()
-        if instance.author_user != request.user:
-            return Response(
-                {"error": "Only the author of the issue can edit it."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -258,36 +540,32 @@ class IssueRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 """COMMENTS"""
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(
+    ConditionalListMixin, ShapedQuerysetMixin, generics.ListCreateAPIView
+):
     serializer_class = CommentSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         project_id = self.kwargs["project_id"]
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(self.request, project)
-        # Check if the user is a contributor to the project
-        is_contributor = Contributor.objects.filter(
-            user_id=self.request.user.id, project_id=project_id
-        ).exists()
-
-        if is_contributor:
-            # Filter comments based on the issue_id
-            return Comment.objects.filter(project=project_id)
-        else:
-            # Return an empty queryset if the user is not a contributor
-            return Comment.objects.none()
+        # Only the thread of the issue being viewed. Matching the project
+        # through the issue keeps the (issue, created_time, id) index in use.
+        return Comment.objects.filter(
+            issue_id=self.kwargs["issue_id"], issue__project_id=project_id
+        )
 
     def post(self, request, *args, **kwargs):
         project_id = self.kwargs["project_id"]
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(self.request, project)
         issue_id = self.kwargs["issue_id"]
-        issue = get_object_or_404(Issue, id=issue_id)
+        issue = get_object_or_404(Issue, project_id=project_id, id=issue_id)
 
-        self.check_object_permissions(self.request, project)
         data = self.request.data.copy()
-        print(data)
+        logger.debug("New comment on issue %s: %s", issue_id, data)
         data[
             "author_user"
         ] = request.user.id  # set author_user to ID of authenticated user
@@ -303,9 +581,98 @@ class CommentListCreateView(generics.ListCreateAPIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ProjectCommentListView(
+    ConditionalListMixin, ShapedQuerysetMixin, generics.ListAPIView
+):
+    """
+    Feed of the comments of every issue of a project.
+    """
+
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        project_id = self.kwargs["project_id"]
+        project = get_object_or_404(Project, id=project_id)
+        self.check_object_permissions(self.request, project)
+        return Comment.objects.filter(project_id=project_id)
+
+
+class ProjectSearchView(generics.ListAPIView):
+    """
+    Full-text search over the issues (``?type=issues``, the default) or the
+    comments (``?type=comments``) of a project, best matches first.
+
+    Every word of ``?q=`` must match.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+    pagination_class = SearchPagination
+    # Filtering and ordering are done by the search index
+    filter_backends = []
+    serializer_classes = {"issues": IssueSerializer, "comments": CommentSerializer}
+
+    def get_search_type(self):
+        search_type = self.request.query_params.get("type", "issues")
+        if search_type not in TARGETS:
+            raise ValidationError({"type": [f"Must be one of: {', '.join(TARGETS)}."]})
+        return search_type
+
+    def get_serializer_class(self):
+        return self.serializer_classes[self.get_search_type()]
+
+    def get_queryset(self):
+        project = get_object_or_404(Project, id=self.kwargs["project_id"])
+        self.check_object_permissions(self.request, project)
+
+        terms = search_terms(self.request.query_params.get("q"))
+        if not terms:
+            raise ValidationError({"q": ["This field is required."]})
+        target = TARGETS[self.get_search_type()]
+        serializer_class = self.get_serializer_class()
+        return SearchResults(
+            serializer_class.shape_queryset(target.model.objects.all()),
+            target,
+            project.id,
+            terms,
+        )
+
+
+class ProjectExportView(APIView):
+    """
+    Stream a whole project, its issues and their comments, as NDJSON
+    (``?output=ndjson``, the default) or as a single CSV table
+    (``?output=csv``), one row per object.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
+
+    def get(self, request, project_id):
+        project = get_object_or_404(Project, id=project_id)
+        self.check_object_permissions(request, project)
+
+        # Not "format", which selects the renderer of DRF responses
+        output = request.query_params.get("output", "ndjson")
+        if output not in export.FORMATS:
+            raise ValidationError(
+                {"output": [f"Must be one of: {', '.join(export.FORMATS)}."]}
+            )
+        encode, content_type = export.FORMATS[output]
+        response = StreamingHttpResponse(
+            encode(export.export_rows(project.id)), content_type=content_type
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="project-{project.id}.{output}"'
+        return response
+
+
+class CommentRetrieveUpdateDestroyView(
+    ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = CommentSerializer
-    permission_classes = [permissions.IsAuthenticated, IsProjectContributor]
+    permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
     lookup_url_kwarg = "comment_id"
 
     def get_object(self):
@@ -314,7 +681,11 @@ class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         self.check_object_permissions(self.request, project)
         issue_id = self.kwargs["issue_id"]
         comment_id = self.kwargs[self.lookup_url_kwarg]
-        obj = get_object_or_404(Comment, issue_id=issue_id, id=comment_id)
+        obj = get_object_or_404(
+            Comment.objects.select_related("author_user"),
+            issue_id=issue_id,
+            id=comment_id,
+        )
         self.check_object_permissions(self.request, obj)
         return obj
 